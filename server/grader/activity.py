@@ -0,0 +1,121 @@
+"""
+Submission activity over time, bucketed in the database.
+
+Submissions are grouped by course and by the day or week (``TruncDate`` /
+``TruncWeek`` in the current time zone) of their ``updated_at``, with counts
+and score sums, in one grouped query; the overall series is the per-course
+series added together.
+
+Uploads only ever add rows to the current bucket, so every earlier bucket is
+closed: its totals are kept in Django's cache and each request only groups the
+submissions of the open bucket, a range scan of the
+``(associated_with, updated_at)`` index. Writes that can reach back into
+closed buckets (a re-upload replacing a student's earlier submission, saving
+or deleting a single submission, editing or deleting a course) call
+``forget`` so the history is rebuilt once.
+"""
+
+import datetime
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+
+PERIODS = {"day": TruncDate, "week": TruncWeek}
+
+
+def _history_key(author):
+    return f"grader:activity:{author}"
+
+
+def history_version(author):
+    key = _history_key(author)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def forget(author):
+    """Drop the cached closed buckets of every ``author`` series."""
+    cache.set(_history_key(author), time.time_ns(), None)
+
+
+def open_bucket(period, today=None):
+    """First day of the bucket that is still receiving submissions."""
+    today = today or timezone.localdate()
+    if period == "week":
+        return today - datetime.timedelta(days=today.weekday())
+    return today
+
+
+def bucket_rows(submissions, period):
+    """``(course_code, start, count, score_sum, percentage_sum)`` rows."""
+    return list(
+        submissions.annotate(
+            bucket=PERIODS[period]("updated_at", output_field=DateField())
+        )
+        .values_list("associated_with__course_code", "bucket")
+        .annotate(count=Count("*"), score=Sum("score"), percentage=Sum("percentage"))
+        .order_by()
+    )
+
+
+def series(rows):
+    """Buckets of ``rows``, oldest first, with averages per submission."""
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    for _, start, count, score, percentage in rows:
+        bucket = totals[start]
+        bucket[0] += count
+        bucket[1] += score
+        bucket[2] += percentage
+
+    return [
+        {
+            "start": start,
+            "submissions": count,
+            "averageScore": score / count,
+            "averagePercentage": percentage / count,
+        }
+        for start, (count, score, percentage) in sorted(totals.items())
+    ]
+
+
+def activity(submissions, author, period, course_code=None):
+    """
+    Activity series of ``submissions``, overall and per course, reusing the
+    cached closed buckets when the open bucket hasn't moved on since.
+    """
+    start = open_bucket(period)
+    key = (
+        f"{_history_key(author)}:{history_version(author)}:{period}:"
+        f"{course_code or ''}"
+    )
+    closed = cache.get(key)
+
+    if closed is not None and closed["until"] == start:
+        since = timezone.make_aware(datetime.datetime.combine(start, datetime.time()))
+        rows = closed["rows"] + bucket_rows(
+            submissions.filter(updated_at__gte=since), period
+        )
+    else:
+        rows = bucket_rows(submissions, period)
+        history = [row for row in rows if row[1] < start]
+        cache.set(key, {"until": start, "rows": history}, None)
+
+    courses = defaultdict(list)
+    for row in rows:
+        courses[row[0]].append(row)
+
+    return {
+        "period": period,
+        "buckets": series(rows),
+        "courses": [
+            {"courseCode": code, "buckets": series(course_rows)}
+            for code, course_rows in sorted(courses.items())
+        ],
+    }
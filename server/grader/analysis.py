@@ -0,0 +1,100 @@
+"""
+Item analysis for a course's questions.
+
+The course's packed answers are unpacked once into a ``(students, questions)``
+code matrix and every statistic is computed column-wise over it.
+"""
+
+import hashlib
+
+import numpy as np
+from django.core.cache import cache
+
+from . import codec
+from .models import Submission
+
+# Share of students in each of the upper and lower groups used for the
+# discrimination index.
+GROUP_FRACTION = 0.27
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def item_statistics(key, matrix):
+    """
+    Compute per-question statistics for a code matrix.
+
+    Returns a dict of equal-length lists: ``difficulty`` (share correct),
+    ``discrimination`` (upper minus lower group difficulty),
+    ``pointBiserial`` (correlation of each item with the total score) and
+    ``options`` (how many students chose each option, plus blanks).
+    """
+    students, questions = matrix.shape
+    correct = (matrix == key) & (key != codec.BLANK)
+    totals = correct.sum(axis=1, dtype=np.int64)
+
+    if not students:
+        zeros = [0.0] * questions
+        return {
+            "difficulty": zeros,
+            "discrimination": zeros,
+            "pointBiserial": zeros,
+            "options": {c: [0] * questions for c in [*codec.CHOICES, "blank"]},
+        }
+
+    as_float = correct.astype(np.float32)
+    difficulty = as_float.mean(axis=0)
+
+    group = max(1, int(round(students * GROUP_FRACTION)))
+    order = np.argsort(totals, kind="stable")
+    lower = as_float[order[:group]].mean(axis=0)
+    upper = as_float[order[-group:]].mean(axis=0)
+
+    # r_pb = (E[x t] - p E[t]) / (sqrt(p q) * sd(t)), one matrix-vector product
+    t = totals.astype(np.float64)
+    covariance = (as_float.T @ t) / students - difficulty * t.mean()
+    spread = np.sqrt(difficulty * (1 - difficulty)) * t.std()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        point_biserial = np.where(spread > 0, covariance / spread, 0.0)
+
+    options = {
+        choice: ((matrix & (1 << i)) != 0).sum(axis=0).tolist()
+        for i, choice in enumerate(codec.CHOICES)
+    }
+    options["blank"] = (matrix == codec.BLANK).sum(axis=0).tolist()
+
+    return {
+        "difficulty": difficulty.tolist(),
+        "discrimination": (upper - lower).tolist(),
+        "pointBiserial": point_biserial.tolist(),
+        "options": options,
+    }
+
+
+def _cache_key(course):
+    # Changes whenever submissions are added, changed or removed, or the
+    # answer key itself is edited.
+    digest = hashlib.blake2b(bytes(course.keys), digest_size=8)
+    stats = getattr(course, "stats", None)
+    if stats:
+        marker = f"{stats.submission_count}:{stats.score_sum}:{stats.last_activity}"
+        digest.update(marker.encode())
+    return f"grader:items:{course.id}:{digest.hexdigest()}"
+
+
+def course_item_analysis(course):
+    """Item statistics for ``course``, cached until its data changes."""
+    key = _cache_key(course)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    width = codec.length(course.keys)
+    packed = Submission.objects.filter(associated_with=course).values_list(
+        "answers", flat=True
+    )
+    matrix = codec.unpack(list(packed.iterator(chunk_size=5000)), width)
+    key_codes = codec.unpack([course.keys], width)[0]
+
+    result = {"totalSubmissions": matrix.shape[0], **item_statistics(key_codes, matrix)}
+    cache.set(key, result, CACHE_TIMEOUT)
+    return result
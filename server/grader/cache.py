@@ -0,0 +1,204 @@
+"""
+Versioned response cache for the read endpoints.
+
+Responses are kept in a bounded, in-process LRU. Every entry's key includes
+the current version of the author (or of one of the author's courses), and
+the write paths bump that version, so stale entries are never looked up again
+and simply age out of the LRU.
+
+The same versioned key doubles as a strong ETag, so clients that revalidate
+with ``If-None-Match`` get a 304 without any aggregation being run.
+
+Versions live in Django's cache framework, which settings require to be
+shared between processes, so a write in any web worker or ``grader_worker``
+invalidates every process's entries. A bump replaces the version with a new
+one rather than incrementing it: on a shared backend increments from two
+processes can race and one be lost.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+def _version_key(author, course_code=None):
+    if course_code:
+        return f"grader:version:{author}:{course_code.upper()}"
+    return f"grader:version:{author}"
+
+
+def _new_version():
+    # Not 0: a version that was evicted and re-created must not collide with
+    # keys cached under the old one.
+    return time.time_ns()
+
+
+class ResponseCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, author, course_code=None):
+        key = _version_key(author, course_code)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, _new_version(), None)
+            version = cache.get(key)
+        return version
+
+    async def aversion(self, author, course_code=None):
+        """``version`` for async views, which must not block the event loop."""
+        key = _version_key(author, course_code)
+        version = await cache.aget(key)
+        if version is None:
+            await cache.aadd(key, _new_version(), None)
+            version = await cache.aget(key)
+        return version
+
+    def bump(self, author, *course_codes):
+        """Invalidate everything cached for ``author`` and the given courses."""
+        cache.set_many(
+            {
+                key: _new_version()
+                for key in [_version_key(author)]
+                + [_version_key(author, code) for code in course_codes if code]
+            },
+            None,
+        )
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxSize": self.max_entries,
+            }
+
+
+response_cache = ResponseCache(settings.GRADER_RESPONSE_CACHE_SIZE)
+
+
+def _etag(key):
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def json_response(data=None, status=200):
+    """
+    The plain Django counterpart of DRF's ``Response`` for async views, which
+    ``api_view`` cannot wrap. Rendered by DRF's renderer so the bodies match.
+    """
+    response = HttpResponse(
+        JSONRenderer().render(data) if data is not None else b"",
+        content_type="application/json",
+        status=status,
+    )
+    response.data = data
+    return response
+
+
+def cached_response(view):
+    """
+    Serve a read view from ``response_cache`` and answer conditional requests.
+
+    The author comes from the ``email`` URL argument or the ``id`` query
+    parameter; views with a ``course_code`` are versioned per course, the
+    rest per author. The strong ETag is derived from the same versioned key,
+    so a matching ``If-None-Match`` gets a 304 without touching the database.
+    Only 200 responses are cached. Works on DRF views and on async views
+    returning ``json_response``, which read the version through the cache's
+    async API.
+    """
+
+    def scope(request, kwargs):
+        return kwargs.get("email") or request.GET.get("id"), kwargs.get("course_code")
+
+    def lookup(request, version, respond):
+        key = (view.__name__, request.get_full_path(), version)
+        etag = _etag(key)
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return key, etag, respond(status=304)
+
+        data = response_cache.get(key)
+        if data is not None:
+            return key, etag, respond(data, status=200)
+        return key, etag, None
+
+    def finish(key, etag, response, fresh):
+        if fresh and response.status_code == 200:
+            response_cache.set(key, response.data)
+
+        if response.status_code in [200, 304]:
+            response["ETag"] = etag
+            # Let browsers keep the body but revalidate on every use
+            response["Cache-Control"] = "private, no-cache"
+        return response
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            version = await response_cache.aversion(*scope(request, kwargs))
+            key, etag, response = lookup(request, version, json_response)
+            fresh = response is None
+            if fresh:
+                response = await view(request, *args, **kwargs)
+            return finish(key, etag, response, fresh)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        version = response_cache.version(*scope(request, kwargs))
+        key, etag, response = lookup(request, version, Response)
+        fresh = response is None
+        if fresh:
+            response = view(request, *args, **kwargs)
+        return finish(key, etag, response, fresh)
+
+    return wrapper
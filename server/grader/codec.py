@@ -0,0 +1,151 @@
+"""
+Packed encoding for answer keys and student answers.
+
+Each answer is a 4-bit code with one bit per option (A=1, B=2, C=4, D=8) and
+0 meaning blank or invalid. A "select all that apply" answer sets several
+bits. Two answers share a byte, after a 2-byte little-endian count of
+answers. The codes are what the grading engine works on, so answers never
+need to be turned back into strings except at the API boundary.
+
+As text an answer is one character, a letter or a space for blank, and a set
+of options is written in brackets: ``"AB[AC]D"`` is four answers, the third
+being A and C.
+"""
+
+import re
+
+import numpy as np
+
+CHOICES = "ABCD"
+BLANK = 0
+HEADER_SIZE = 2
+MAX_ANSWERS = 0xFFFF
+
+# ASCII byte -> answer code
+_ENCODE = np.zeros(256, dtype=np.uint8)
+for _i, _choice in enumerate(CHOICES):
+    _ENCODE[ord(_choice)] = _ENCODE[ord(_choice.lower())] = 1 << _i
+
+# answer code -> ASCII byte; anything that isn't a single option shows as blank
+_DECODE = np.full(16, ord(" "), dtype=np.uint8)
+for _i, _choice in enumerate(CHOICES):
+    _DECODE[1 << _i] = ord(_choice)
+
+# answer code -> its options, e.g. 5 -> "AC"; blank is a space
+LABELS = [
+    "".join(c for i, c in enumerate(CHOICES) if code & (1 << i)) or " "
+    for code in range(16)
+]
+# answer code -> number of options set
+POPCOUNT = np.array([bin(code).count("1") for code in range(16)], dtype=np.int64)
+
+# One answer: a bracketed set of options or any single character
+_TOKEN = re.compile(r"\[([^\]]*)\]|[^\[]")
+_KEY = re.compile(rf"(?:[{CHOICES}]|\[[{CHOICES}]+\])+")
+
+
+def _as_text(answers):
+    return answers if isinstance(answers, str) else "".join(answers)
+
+
+def _parse(text):
+    """Codes of one answer string that contains bracketed sets."""
+    codes = []
+    for match in _TOKEN.finditer(text):
+        options = match.group(1) if match.group(1) is not None else match.group(0)
+        buffer = np.frombuffer(options.encode("ascii", "replace"), dtype=np.uint8)
+        codes.append(int(np.bitwise_or.reduce(_ENCODE[buffer], initial=0)))
+    return codes
+
+
+def count(text):
+    """Number of answers in an answer string."""
+    text = _as_text(text)
+    if "[" not in text:
+        return len(text)
+    return sum(1 for _ in _TOKEN.finditer(text))
+
+
+def to_codes(answers, width):
+    """Convert answer strings into a ``(len(answers), width)`` code matrix."""
+    if not answers or width == 0:
+        return np.zeros((len(answers), width), dtype=np.uint8)
+
+    texts = [_as_text(a) for a in answers]
+    if any("[" in text for text in texts):
+        codes = np.zeros((len(texts), width), dtype=np.uint8)
+        for row, text in zip(codes, texts):
+            parsed = _parse(text)[:width]
+            row[: len(parsed)] = parsed
+        return codes
+
+    joined = "".join(text[:width].ljust(width) for text in texts)
+    buffer = np.frombuffer(joined.encode("ascii", "replace"), dtype=np.uint8)
+    return _ENCODE[buffer].reshape(len(texts), width)
+
+
+def pack_codes(codes):
+    """Pack each row of a code matrix into its stored ``bytes`` form."""
+    rows, width = codes.shape
+    if width > MAX_ANSWERS:
+        raise ValueError(f"Cannot pack more than {MAX_ANSWERS} answers")
+
+    if width % 2:
+        codes = np.pad(codes, ((0, 0), (0, 1)))
+    nibbles = codes.reshape(rows, -1, 2)
+    body = nibbles[:, :, 0] | (nibbles[:, :, 1] << 4)
+
+    header = width.to_bytes(HEADER_SIZE, "little")
+    return [header + row.tobytes() for row in body]
+
+
+def unpack(buffers, width):
+    """Unpack stored buffers into a ``(len(buffers), width)`` code matrix."""
+    size = HEADER_SIZE + (width + 1) // 2
+    joined = b"".join(bytes(b)[:size].ljust(size, b"\0") for b in buffers)
+    body = np.frombuffer(joined, dtype=np.uint8).reshape(len(buffers), size)
+    body = body[:, HEADER_SIZE:]
+
+    codes = np.empty((len(buffers), body.shape[1] * 2), dtype=np.uint8)
+    codes[:, 0::2] = body & 0x0F
+    codes[:, 1::2] = body >> 4
+    return codes[:, :width]
+
+
+def length(packed):
+    return int.from_bytes(bytes(packed[:HEADER_SIZE]), "little")
+
+
+def encode(text):
+    return pack_codes(to_codes([text], count(text)))[0]
+
+
+def to_text(codes):
+    """Render one row of answer codes as an answer string."""
+    if (POPCOUNT[codes] <= 1).all():
+        return _DECODE[codes].tobytes().decode("ascii")
+    return "".join(
+        f"[{LABELS[code]}]" if POPCOUNT[code] > 1 else LABELS[code]
+        for code in codes.tolist()
+    )
+
+
+def to_list(codes):
+    """One row of answer codes as a list of each answer's options."""
+    return [LABELS[code] for code in codes.tolist()]
+
+
+def decode(packed):
+    return to_text(unpack([packed], length(packed))[0])
+
+
+def decode_list(packed):
+    return to_list(unpack([packed], length(packed))[0])
+
+
+def is_valid(text):
+    """
+    Whether ``text`` is a valid answer key: every answer one of ``CHOICES``
+    or a bracketed set of them.
+    """
+    return bool(text) and _KEY.fullmatch(text.upper()) is not None
@@ -0,0 +1,116 @@
+"""
+Score distributions aggregated in the database.
+
+A course has far fewer distinct percentages than submissions, so the database
+groups submissions by ``(percentage, grade)`` and only those counts leave it.
+On one course the grouping is a scan of the covering
+``(associated_with, percentage, grade)`` index. Every statistic (moments,
+quantiles, histogram, grade counts) is then exact arithmetic on the small
+weighted table, which also sidesteps SQLite's lack of percentile and
+standard deviation functions.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import Count
+
+HISTOGRAM_BUCKETS = 10
+QUANTILES = {"q1": 0.25, "median": 0.5, "q3": 0.75}
+
+
+def quantiles(values, counts):
+    """
+    Linearly interpolated quantiles of ``values`` repeated ``counts`` times,
+    as ``numpy.percentile`` would give on the expanded data.
+    """
+    total = counts.sum()
+    if not total:
+        return {name: None for name in QUANTILES}
+
+    # Index of the last copy of each value in the expanded, sorted data
+    last = np.cumsum(counts) - 1
+    positions = np.array(list(QUANTILES.values())) * (total - 1)
+    low = np.floor(positions).astype(np.int64)
+    high = np.minimum(low + 1, total - 1)
+
+    lower = values[np.searchsorted(last, low)]
+    upper = values[np.searchsorted(last, high)]
+    result = lower + (upper - lower) * (positions - low)
+
+    return {name: float(value) for name, value in zip(QUANTILES, result)}
+
+
+def histogram(values, counts):
+    """Counts of percentages in equal-width buckets; 100% falls in the last."""
+    width = 100 / HISTOGRAM_BUCKETS
+    buckets = np.clip((values // width).astype(np.int64), 0, HISTOGRAM_BUCKETS - 1)
+    totals = np.bincount(buckets, weights=counts, minlength=HISTOGRAM_BUCKETS)
+
+    return [
+        {"from": i * width, "to": (i + 1) * width, "count": int(count)}
+        for i, count in enumerate(totals)
+    ]
+
+
+def summarize(rows):
+    """Distribution of ``(percentage, grade, count)`` rows."""
+    grades = defaultdict(int)
+    by_value = defaultdict(int)
+    for percentage, grade, count in rows:
+        grades[grade] += count
+        by_value[percentage] += count
+
+    values = np.array(sorted(by_value), dtype=np.float64)
+    counts = np.array([by_value[v] for v in sorted(by_value)], dtype=np.int64)
+    total = int(counts.sum())
+
+    if total:
+        mean = float(np.dot(values, counts) / total)
+        std_dev = float(np.sqrt(np.dot((values - mean) ** 2, counts) / total))
+        low, high = float(values[0]), float(values[-1])
+    else:
+        mean = std_dev = low = high = None
+
+    return {
+        "count": total,
+        "mean": mean,
+        "stdDev": std_dev,
+        "min": low,
+        "max": high,
+        **quantiles(values, counts),
+        "histogram": histogram(values, counts),
+        "grades": dict(sorted(grades.items(), key=lambda item: str(item[0]))),
+    }
+
+
+def _grouped(submissions, *fields):
+    return (
+        submissions.values_list(*fields, "percentage", "grade")
+        .annotate(count=Count("*"))
+        .order_by()
+    )
+
+
+def distribution(submissions):
+    """Full percentage distribution of ``submissions``, from one grouped query."""
+    return summarize(_grouped(submissions))
+
+
+def course_distributions(submissions):
+    """
+    The overall distribution of ``submissions`` and one per course, all from a
+    single grouped query.
+    """
+    rows = list(_grouped(submissions, "associated_with__course_code"))
+
+    courses = defaultdict(list)
+    for course_code, percentage, grade, count in rows:
+        courses[course_code].append((percentage, grade, count))
+
+    overall = summarize(row[1:] for row in rows)
+    overall["courses"] = [
+        {"courseCode": code, **summarize(course_rows)}
+        for code, course_rows in sorted(courses.items())
+    ]
+    return overall
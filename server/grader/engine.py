@@ -0,0 +1,285 @@
+"""
+Batch grading engine.
+
+A whole cohort is scored as a ``(students, questions)`` matrix of answer codes
+(see ``grader.codec``) with a handful of NumPy operations instead of a Python
+loop per character. Scores are tracked in hundredths of a mark, which keeps
+negative marking (``Setting.points_deducted`` has two decimal places) exact.
+
+A key answer may set several options ("select all that apply"). Normally a
+question only scores when the student picked exactly the key's options; with
+partial credit each correct option picked is worth an equal share of the mark
+and each wrong option picked cancels one correct one.
+"""
+
+from decimal import Decimal
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from .codec import BLANK, POPCOUNT, count, to_codes
+
+# ``(grade, minimum percentage, passing)`` bands of the built-in scales
+STANDARD_SCALE = (
+    ("A", 90, True),
+    ("B", 80, True),
+    ("C", 70, True),
+    ("D", 60, True),
+    ("E", 50, True),
+    ("F", 0, False),
+)
+NUMERIC_SCALE = tuple((str(p), p, p >= 50) for p in range(100, -1, -1))
+BUILTIN_SCALES = {"STD": STANDARD_SCALE, "NUM": NUMERIC_SCALE}
+# Grade points of a scale's top band. Passing bands are spaced evenly below it
+# and failing bands are worth nothing, so the standard scale maps A-E to 5-1
+GRADE_POINT_MAX = 5.0
+
+
+class InvalidScale(ValueError):
+    pass
+
+
+class GradedBatch(NamedTuple):
+    scores: list
+    percentages: list
+    grades: list
+
+
+class GradingScale(NamedTuple):
+    """A compiled scale: ascending band minimums and the grade of each band."""
+
+    cutoffs: np.ndarray
+    grades: np.ndarray
+    passing: frozenset
+    points: dict
+
+    def grade(self, percentages):
+        """Grade a sequence of percentages with one vectorized search."""
+        bands = np.searchsorted(self.cutoffs, percentages, side="right") - 1
+        return self.grades[np.maximum(bands, 0)].tolist()
+
+    def bands(self):
+        """``(grade, minimum)`` pairs, highest band first."""
+        return list(zip(self.grades[::-1].tolist(), self.cutoffs[::-1].tolist()))
+
+
+@lru_cache(maxsize=256)
+def compile_scale(bands):
+    """Compile a tuple of ``(grade, minimum, passing)`` bands."""
+    if not bands:
+        raise InvalidScale("A grading scale needs at least one band")
+
+    ordered = sorted(bands, key=lambda band: band[1])
+    grades = [str(grade) for grade, _, _ in ordered]
+    cutoffs = [float(minimum) for _, minimum, _ in ordered]
+
+    if len(set(grades)) != len(grades):
+        raise InvalidScale("Grades must be unique")
+    if len(set(cutoffs)) != len(cutoffs):
+        raise InvalidScale("Band minimums must be unique")
+    if cutoffs[0] != 0 or cutoffs[-1] > 100:
+        raise InvalidScale("Band minimums must run from 0 up to at most 100")
+
+    passing = frozenset(str(grade) for grade, _, passes in bands if passes)
+    ranked = [grade for grade in grades if grade in passing]
+    points = dict.fromkeys(grades, 0.0)
+    points.update(
+        (grade, GRADE_POINT_MAX * (rank + 1) / len(ranked))
+        for rank, grade in enumerate(ranked)
+    )
+
+    return GradingScale(
+        cutoffs=np.array(cutoffs),
+        grades=np.array(grades, dtype=object),
+        passing=passing,
+        points=points,
+    )
+
+
+def parse_scale(grading_scale, custom=None):
+    """
+    Band tuple for an ``AnswerKey.grading_scale``. Custom scales are a list of
+    ``{"grade", "min", "passing"}`` objects.
+    """
+    if grading_scale in BUILTIN_SCALES:
+        return BUILTIN_SCALES[grading_scale]
+
+    if not isinstance(custom, list):
+        raise InvalidScale("A custom grading scale needs a list of bands")
+
+    try:
+        return tuple(
+            (str(band["grade"]), float(band["min"]), bool(band.get("passing")))
+            for band in custom
+        )
+    except (AttributeError, KeyError, TypeError, ValueError):
+        raise InvalidScale("Each band needs a grade and a numeric min")
+
+
+def get_scale(grading_scale, custom=None):
+    return compile_scale(parse_scale(grading_scale, custom))
+
+
+def get_grade(score):
+    if score >= 90:
+        return "A"
+    elif score >= 80:
+        return "B"
+    elif score >= 70:
+        return "C"
+    elif score >= 60:
+        return "D"
+    elif score >= 50:
+        return "E"
+    else:
+        return "F"
+
+
+def _partial_credit_table():
+    # (key code << 4 | answer code) -> hundredths of a mark
+    key, answer = np.divmod(np.arange(256), 16)
+    right = POPCOUNT[answer & key]
+    wrong = POPCOUNT[answer & ~key & 0x0F]
+    options = POPCOUNT[key]
+    credit = np.maximum(right - wrong, 0) * 100 // np.maximum(options, 1)
+    return np.where(options > 0, credit, 0).astype(np.int16)
+
+
+# Partial credit is ``(right options - wrong options) / key options`` of the
+# mark, never below zero, rounded down to a hundredth
+PARTIAL_CREDIT = _partial_credit_table()
+
+
+def score_matrix(
+    key, matrix, negative_marking=False, points_deducted=0, partial_credit=False
+):
+    """
+    Score a code matrix against the key's codes. Blank answers never match.
+
+    Returns ``(hundredths, deducted)``: the score of every row in hundredths of
+    a mark, and whether a deduction was ever applied to that row.
+    """
+    rows = matrix.shape[0]
+    if partial_credit:
+        credit, unit = PARTIAL_CREDIT[(key << 4) | matrix], 1
+    else:
+        credit, unit = (matrix == key) & (key != BLANK), 100
+
+    if not negative_marking:
+        return credit.sum(axis=1, dtype=np.int64) * unit, np.zeros(rows, dtype=bool)
+
+    # A deduction only applies while the running score is above it, so the
+    # result depends on question order. Walk the columns, not the students.
+    # Answers that earned any credit are never penalised.
+    deduction = int(Decimal(str(points_deducted)).scaleb(2))
+    hundredths = np.zeros(rows, dtype=np.int64)
+    deducted = np.zeros(rows, dtype=bool)
+    for column in credit.T:
+        apply = (column == 0) & (hundredths > deduction)
+        hundredths += column * unit - apply * deduction
+        deducted |= apply
+
+    return hundredths, deducted
+
+
+def _score_value(hundredths, deducted):
+    # Once a deduction or partial credit makes a score fractional the legacy
+    # score is a Decimal, otherwise an int.
+    if deducted or hundredths % 100:
+        return Decimal(hundredths).scaleb(-2)
+    return hundredths // 100
+
+
+def grade_codes(
+    key,
+    matrix,
+    no_of_questions,
+    negative_marking=False,
+    points_deducted=0,
+    scale=None,
+    partial_credit=False,
+):
+    """
+    Grade every row of a code matrix against the key's codes.
+
+    Percentages and grades are resolved once per distinct score, so they come
+    out exactly as ``grade_student`` computes them for each row. ``scale``
+    defaults to the standard A–F scale.
+    """
+    hundredths, deducted = score_matrix(
+        key, matrix, negative_marking, points_deducted, partial_credit
+    )
+
+    pairs = np.stack([hundredths, deducted.astype(np.int64)], axis=1)
+    unique, inverse = np.unique(pairs, axis=0, return_inverse=True)
+
+    scores, percentages = [], []
+    for value, was_deducted in unique.tolist():
+        score = _score_value(value, was_deducted)
+        if no_of_questions == 0:
+            percentage = 0
+        else:
+            percentage = round((score / no_of_questions) * 100, 2)
+
+        scores.append(float(score))
+        percentages.append(float(percentage))
+
+    grades = (scale or get_scale("STD")).grade(percentages)
+
+    inverse = inverse.reshape(-1).tolist()
+    return GradedBatch(
+        scores=[scores[i] for i in inverse],
+        percentages=[percentages[i] for i in inverse],
+        grades=[grades[i] for i in inverse],
+    )
+
+
+def grade_batch(
+    keys,
+    answers,
+    no_of_questions,
+    negative_marking=False,
+    points_deducted=0,
+    scale=None,
+    partial_credit=False,
+):
+    """Grade a list of answer strings against an answer key string."""
+    width = count(keys)
+    key = to_codes([keys], width)[0]
+    matrix = to_codes(answers, width)
+    return grade_codes(
+        key,
+        matrix,
+        no_of_questions,
+        negative_marking,
+        points_deducted,
+        scale,
+        partial_credit,
+    )
+
+
+def grade_student(
+    keys, answers, no_of_questions, negative_marking=False, points_deducted=0
+):
+    """Grade a single answer string one character at a time."""
+    j = 0
+    score = 0
+    while j < len(keys):
+        # If correct
+        if answers[j].upper() == keys[j].upper():
+            score = score + 1
+        else:
+            # If negative marking is True: Deduct score
+            if negative_marking:
+                if score > points_deducted:
+                    score = score - points_deducted
+
+        j = j + 1
+
+    if no_of_questions == 0:
+        percentage = 0
+    else:
+        percentage = round((score / no_of_questions) * 100, 2)
+
+    return score, percentage, get_grade(percentage)
@@ -0,0 +1,111 @@
+"""
+Course result exports.
+
+Submissions are read with a chunked ``.iterator()`` and each chunk's packed
+answers are unpacked and compared with the key as one matrix, so memory stays
+flat regardless of course size. CSV is streamed as it is produced; XLSX is
+written row by row with openpyxl's write-only mode (optional dependency) to a
+temporary file that is then streamed.
+"""
+
+import csv
+import io
+import tempfile
+
+from . import codec
+from .ingest import chunked
+from .models import Submission
+
+EXPORT_CHUNK_SIZE = 2000
+
+FIELDS = [
+    "student_id",
+    "student_name",
+    "score",
+    "percentage",
+    "grade",
+    "updated_at",
+    "answers",
+]
+
+
+def header(course):
+    questions = codec.length(course.keys)
+    return [
+        "Student ID",
+        "Student Name",
+        "Score",
+        "Percentage",
+        "Grade",
+        "Time Processed",
+    ] + [f"Q{i + 1}" for i in range(questions)]
+
+
+def iter_rows(course):
+    """Yield lists of export rows, one list per chunk of submissions."""
+    width = codec.length(course.keys)
+    key = codec.unpack([course.keys], width)[0]
+
+    submissions = (
+        Submission.objects.filter(associated_with=course)
+        .order_by("student_id", "id")
+        .values_list(*FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    for chunk in chunked(submissions, EXPORT_CHUNK_SIZE):
+        matrix = codec.unpack([row[-1] for row in chunk], width)
+        correct = ((matrix == key) & (key != codec.BLANK)).astype(int).tolist()
+
+        yield [
+            [
+                student_id,
+                student_name or "",
+                score,
+                percentage,
+                grade,
+                updated_at.strftime("%d/%m/%Y"),
+                *marks,
+            ]
+            for (
+                student_id,
+                student_name,
+                score,
+                percentage,
+                grade,
+                updated_at,
+                _,
+            ), marks in zip(chunk, correct)
+        ]
+
+
+def iter_csv(course):
+    """Yield the course's results as CSV text, one chunk at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header(course))
+    for rows in iter_rows(course):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def write_xlsx(course):
+    """Write the course's results to a temporary XLSX file and return it."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(course.course_code)
+    sheet.append(header(course))
+    for rows in iter_rows(course):
+        for row in rows:
+            sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,391 @@
+"""
+Validation and persistence of student submission batches.
+
+A batch is checked in full before anything is written, then graded with the
+batch engine and written inside one transaction, so an upload either lands
+completely or not at all. Rows are upserted on (course, student ID): uploading
+a student again replaces their submission. On PostgreSQL rows are streamed in
+with ``COPY``; elsewhere they go through chunked ``bulk_create``.
+
+Streamed uploads (NDJSON or CSV) are parsed, graded and committed one chunk at
+a time so memory stays bounded by ``BULK_CHUNK_SIZE`` rather than cohort size.
+
+With ``GRADER_WRITE_QUEUE`` on, batches graded concurrently in one process are
+handed to ``write_queue``, which commits whatever has queued up in a single
+transaction from one thread at a time; SQLite then sees one writer per process
+instead of many contending for its lock.
+"""
+
+import csv
+import json
+import threading
+from collections import deque
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import activity, codec
+from .engine import grade_codes
+from .models import CourseStats, Submission
+
+BULK_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+# Columns written by COPY; the id comes from the table's sequence
+COPY_FIELDS = [
+    "student_id",
+    "student_name",
+    "associated_with",
+    "answers",
+    "created_at",
+    "updated_at",
+    "score",
+    "percentage",
+    "grade",
+]
+# A student has one submission per course; re-uploads replace it
+UPSERT_KEY = ["associated_with", "student_id"]
+UPSERT_FIELDS = [
+    "student_name",
+    "answers",
+    "updated_at",
+    "score",
+    "percentage",
+    "grade",
+]
+
+
+def validate_students(students, answer_key, start=0):
+    """
+    Check every row of an upload against ``answer_key``.
+
+    Returns ``(rows, errors)``. ``rows`` holds the cleaned
+    ``(student_id, student_name, answers)`` tuples; ``errors`` has one entry
+    per bad row, numbered from ``start``.
+    """
+    rows = []
+    errors = []
+    width = codec.length(answer_key.keys)
+
+    for index, student in enumerate(students, start):
+        if not isinstance(student, dict):
+            errors.append({"row": index, "error": "Expected an object"})
+            continue
+
+        student_id = student.get("studentId")
+        answers = student.get("answers")
+
+        try:
+            student_id = int(student_id)
+        except (TypeError, ValueError):
+            errors.append(
+                {"row": index, "studentId": student_id, "error": "Invalid studentId"}
+            )
+            continue
+
+        if not isinstance(answers, str):
+            errors.append(
+                {"row": index, "studentId": student_id, "error": "Missing answers"}
+            )
+            continue
+
+        given = codec.count(answers)
+        if given < width:
+            errors.append(
+                {
+                    "row": index,
+                    "studentId": student_id,
+                    "error": f"Expected {width} answers, got {given}",
+                }
+            )
+            continue
+
+        rows.append((student_id, student.get("studentName"), answers))
+
+    return rows, errors
+
+
+def build_submissions(answer_key, setting, rows):
+    width = codec.length(answer_key.keys)
+    key = codec.unpack([answer_key.keys], width)[0]
+    matrix = codec.to_codes([answers for _, _, answers in rows], width)
+
+    graded = grade_codes(
+        key,
+        matrix,
+        answer_key.no_of_questions,
+        setting.negative_marking,
+        setting.points_deducted,
+        answer_key.scale,
+        setting.partial_credit,
+    )
+
+    return [
+        Submission(
+            student_id=student_id,
+            student_name=student_name,
+            associated_with=answer_key,
+            answers=packed,
+            score=score,
+            percentage=percentage,
+            grade=grade,
+        )
+        for (student_id, student_name, _), packed, score, percentage, grade in zip(
+            rows, codec.pack_codes(matrix), *graded
+        )
+    ]
+
+
+def bulk_upsert_submissions(submissions):
+    Submission.objects.bulk_create(
+        submissions,
+        batch_size=BULK_CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=UPSERT_KEY,
+        update_fields=UPSERT_FIELDS,
+    )
+
+
+def copy_submissions(submissions):
+    """
+    Upsert ``submissions`` on PostgreSQL: ``COPY`` them into a temporary
+    table, then move them over with one ``INSERT ... ON CONFLICT``. Unlike
+    ``bulk_create`` this neither fills in ``pk`` nor runs ``pre_save``, so the
+    timestamps are set here.
+    """
+    now = timezone.now()
+    qn = connection.ops.quote_name
+    fields = [Submission._meta.get_field(name) for name in COPY_FIELDS]
+    table = qn(Submission._meta.db_table)
+    columns = ", ".join(qn(f.column) for f in fields)
+    key = ", ".join(qn(Submission._meta.get_field(name).column) for name in UPSERT_KEY)
+    updates = ", ".join(
+        f"{column} = EXCLUDED.{column}"
+        for column in (qn(Submission._meta.get_field(n).column) for n in UPSERT_FIELDS)
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE submission_upload AS "
+            f"SELECT {columns} FROM {table} WITH NO DATA"
+        )
+        with cursor.copy(f"COPY submission_upload ({columns}) FROM STDIN") as copy:
+            for s in submissions:
+                s.created_at = s.updated_at = now
+                copy.write_row([getattr(s, f.attname) for f in fields])
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM submission_upload "
+            f"ON CONFLICT ({key}) DO UPDATE SET {updates}"
+        )
+        cursor.execute("DROP TABLE submission_upload")
+
+
+def upsert_submissions(submissions):
+    if connection.vendor == "postgresql":
+        copy_submissions(submissions)
+    else:
+        bulk_upsert_submissions(submissions)
+
+
+def write_batches(batches):
+    """
+    Upsert ``(answer_key, submissions)`` batches in the current transaction.
+
+    A student submitted more than once keeps the last submission. Course
+    totals are folded in incrementally when every row is new, and recomputed
+    when a re-upload replaced stored rows.
+    """
+    courses = {}
+    for answer_key, submissions in batches:
+        _, latest = courses.setdefault(answer_key.id, (answer_key, {}))
+        for s in submissions:
+            latest[s.student_id] = s
+
+    replaced = {
+        key_id
+        for key_id, (_, latest) in courses.items()
+        if any(
+            Submission.objects.filter(
+                associated_with_id=key_id, student_id__in=ids
+            ).exists()
+            for ids in chunked(latest, BULK_CHUNK_SIZE)
+        )
+    }
+
+    upsert_submissions([s for _, latest in courses.values() for s in latest.values()])
+    for key_id, (answer_key, latest) in courses.items():
+        if key_id in replaced:
+            CourseStats.objects.refresh(answer_key)
+            # The replaced rows left their old activity buckets
+            author = answer_key.author.username
+            transaction.on_commit(lambda author=author: activity.forget(author))
+        else:
+            CourseStats.objects.record(answer_key, list(latest.values()))
+
+
+class _Batch:
+    __slots__ = ("answer_key", "submissions", "ready", "leader", "done", "error")
+
+    def __init__(self, answer_key, submissions):
+        self.answer_key = answer_key
+        self.submissions = submissions
+        self.ready = threading.Event()
+        self.leader = self.done = False
+        self.error = None
+
+
+class WriteQueue:
+    """
+    Group commit for submission batches.
+
+    The first caller to find the queue idle becomes the writer: it commits
+    its own batch together with every batch queued behind it (up to
+    ``max_rows``) in one transaction, then hands the writer role to the
+    oldest batch still waiting, so no caller writes more than one group.
+    If a merged transaction fails, its batches are retried one by one and
+    only the failing ones see the error.
+    """
+
+    def __init__(self, max_rows):
+        self.max_rows = max_rows
+        self._pending = deque()
+        self._writing = False
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.transactions = 0
+
+    def submit(self, answer_key, submissions):
+        batch = _Batch(answer_key, submissions)
+        with self._lock:
+            self._pending.append(batch)
+            if not self._writing:
+                self._writing = batch.leader = True
+
+        if not batch.leader:
+            batch.ready.wait()
+        if not batch.done:
+            self._write_group()
+
+        if batch.error is not None:
+            raise batch.error
+
+    def _write_group(self):
+        with self._lock:
+            group = [self._pending.popleft()]
+            rows = len(group[0].submissions)
+            while self._pending and (
+                rows + len(self._pending[0].submissions) <= self.max_rows
+            ):
+                rows += len(self._pending[0].submissions)
+                group.append(self._pending.popleft())
+
+        try:
+            self._commit(group)
+        finally:
+            with self._lock:
+                self.batches += len(group)
+                for batch in group:
+                    batch.done = True
+                    batch.ready.set()
+                if self._pending:
+                    self._pending[0].leader = True
+                    self._pending[0].ready.set()
+                else:
+                    self._writing = False
+
+    def _commit(self, group):
+        try:
+            with transaction.atomic():
+                write_batches([(b.answer_key, b.submissions) for b in group])
+            self.transactions += 1
+            return
+        except Exception as error:
+            if len(group) == 1:
+                group[0].error = error
+                return
+
+        for batch in group:
+            try:
+                with transaction.atomic():
+                    write_batches([(batch.answer_key, batch.submissions)])
+                self.transactions += 1
+            except Exception as error:
+                batch.error = error
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "transactions": self.transactions,
+                "pending": len(self._pending),
+            }
+
+
+write_queue = WriteQueue(settings.GRADER_WRITE_QUEUE_MAX_ROWS)
+
+
+def save_submissions(answer_key, setting, rows):
+    """Grade ``rows`` and insert them atomically. Returns the number saved."""
+    submissions = build_submissions(answer_key, setting, rows)
+
+    # Inside a caller's transaction the rows must be written on its connection
+    if settings.GRADER_WRITE_QUEUE and not connection.in_atomic_block:
+        write_queue.submit(answer_key, submissions)
+    else:
+        with transaction.atomic():
+            write_batches([(answer_key, submissions)])
+
+    return len(submissions)
+
+
+def iter_ndjson(lines):
+    """Yield one record per non-blank line. Malformed lines yield ``None``."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def iter_csv(lines):
+    """Yield one record per CSV row, keyed by the header row."""
+    text = (line.decode("utf-8", "replace") for line in lines)
+    yield from csv.DictReader(text)
+
+
+def chunked(records, size):
+    records = iter(records)
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+def ingest_stream(answer_key, setting, records, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Validate, grade and save ``records`` one chunk at a time.
+
+    Invalid rows are skipped and reported; each chunk of valid rows is
+    committed in its own transaction. Returns the progress counts.
+    """
+    received = saved = rejected = chunks = 0
+    errors = []
+
+    for chunk in chunked(records, chunk_size):
+        rows, chunk_errors = validate_students(chunk, answer_key, start=received)
+        received += len(chunk)
+        rejected += len(chunk_errors)
+        errors.extend(chunk_errors[: MAX_REPORTED_ERRORS - len(errors)])
+
+        if rows:
+            saved += save_submissions(answer_key, setting, rows)
+            chunks += 1
+
+    return {
+        "received": received,
+        "saved": saved,
+        "rejected": rejected,
+        "chunks": chunks,
+        "errors": errors,
+    }
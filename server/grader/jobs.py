@@ -0,0 +1,196 @@
+"""
+Database-backed background jobs.
+
+Request handlers ``enqueue`` a job and return straight away; the
+``grader_worker`` management command claims queued jobs and runs the handler
+registered for their ``kind``. Handlers report progress through
+``Job.progress``/``Job.total`` so clients can poll the job's status.
+
+While a job runs its worker renews a lease on it by touching ``updated_at``;
+a job whose lease has run out is claimed again by another worker.
+"""
+
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import similarity
+from .cache import response_cache
+from .ingest import BULK_CHUNK_SIZE, build_submissions, chunked, write_batches
+from .models import AnswerKey, Job
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def enqueue(kind, payload, total=0):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind}")
+
+    return Job.objects.create(kind=kind, payload=payload, total=total)
+
+
+def claim(worker):
+    """
+    Claim the oldest queued job for ``worker``, or return ``None``.
+
+    A running job whose heartbeat is older than ``GRADER_JOB_LEASE`` belongs
+    to a worker that died, so it is claimed again like a queued one, or
+    failed once it has been started ``GRADER_JOB_MAX_ATTEMPTS`` times.
+
+    Rows are locked with ``SKIP LOCKED`` where the database supports it, and
+    the state change is a compare-and-set, so two workers never run the same
+    job even on SQLite.
+    """
+    while True:
+        with transaction.atomic():
+            now = timezone.now()
+            expired = now - timedelta(seconds=settings.GRADER_JOB_LEASE)
+            claimable = Job.objects.filter(
+                Q(state=Job.QUEUED) | Q(state=Job.RUNNING, updated_at__lt=expired)
+            ).order_by("created_at", "id")
+            if connection.features.has_select_for_update_skip_locked:
+                claimable = claimable.select_for_update(skip_locked=True)
+
+            job = claimable.first()
+            if job is None:
+                return None
+
+            unchanged = Job.objects.filter(
+                pk=job.pk, state=job.state, updated_at=job.updated_at
+            )
+            if (
+                job.state == Job.RUNNING
+                and job.attempts >= settings.GRADER_JOB_MAX_ATTEMPTS
+            ):
+                unchanged.update(
+                    state=Job.FAILED,
+                    error=f"Abandoned by {job.worker} after {job.attempts} attempts",
+                    finished_at=now,
+                    updated_at=now,
+                )
+                continue
+
+            claimed = unchanged.update(
+                state=Job.RUNNING,
+                worker=worker,
+                attempts=F("attempts") + 1,
+                started_at=now,
+                updated_at=now,
+            )
+
+        if not claimed:
+            return None
+
+        job.refresh_from_db()
+        return job
+
+
+def _owned(job):
+    """The job's row, as long as no other worker has claimed it since."""
+    return Job.objects.filter(pk=job.pk, attempts=job.attempts)
+
+
+def _heartbeat(job, stop):
+    """Renew the lease of a running job until ``stop`` is set."""
+    try:
+        while not stop.wait(settings.GRADER_JOB_LEASE / 3):
+            _owned(job).filter(state=Job.RUNNING).update(updated_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def run(job):
+    """
+    Run a claimed job and record its outcome, unless the job's lease ran out
+    and another worker has claimed it meanwhile.
+    """
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job, stop), daemon=True)
+    heartbeat.start()
+    try:
+        result = HANDLERS[job.kind](job)
+    except Exception:
+        job.state = Job.FAILED
+        job.error = traceback.format_exc()
+    else:
+        job.state = Job.SUCCEEDED
+        job.result = result
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    job.finished_at = job.updated_at = timezone.now()
+    _owned(job).update(
+        state=job.state,
+        result=job.result,
+        error=job.error,
+        finished_at=job.finished_at,
+        updated_at=job.updated_at,
+    )
+    return job
+
+
+def report_progress(job, progress, total=None):
+    job.progress = progress
+    if total is not None:
+        job.total = total
+    job.updated_at = timezone.now()
+    _owned(job).update(
+        progress=job.progress, total=job.total, updated_at=job.updated_at
+    )
+
+
+@handler("grade_batch")
+def grade_batch_job(job):
+    """
+    Grade and save a validated upload.
+
+    Rows are graded a chunk at a time so progress is visible while the job
+    runs, then written in one transaction like a synchronous upload: a job
+    that fails saves nothing. Rows were validated before the job was queued.
+    """
+    a = AnswerKey.objects.select_related("author", "setting").get(
+        id=job.payload["answer_key_id"]
+    )
+    s = a.setting
+
+    submissions = []
+    for rows in chunked(job.payload["rows"], BULK_CHUNK_SIZE):
+        submissions += build_submissions(a, s, [tuple(row) for row in rows])
+        report_progress(job, len(submissions))
+
+    with transaction.atomic():
+        write_batches([(a, submissions)])
+
+    response_cache.bump(a.author.username, a.course_code)
+    return {"saved": len(submissions)}
+
+
+@handler("similarity")
+def similarity_job(job):
+    """
+    Screen a course for pairs of students sharing improbably many identical
+    wrong answers. Progress counts blocks of rows compared.
+    """
+    a = AnswerKey.objects.get(id=job.payload["answer_key_id"])
+
+    return similarity.course_similarity(
+        a,
+        top=job.payload["top"],
+        min_shared=job.payload["minShared"],
+        block=similarity.rows_per_block(settings.GRADER_SIMILARITY_MEMORY_MB * 2**20),
+        progress=lambda done, total: report_progress(job, done, total),
+    )
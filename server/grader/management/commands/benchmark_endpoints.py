@@ -0,0 +1,385 @@
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+from io import BytesIO, StringIO
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from grader import codec, omr
+from grader.cache import response_cache
+from grader.management.commands.seed_grader import (
+    FIRST_STUDENT_ID,
+    SEED_PASSWORD,
+    SEED_USER_PREFIX,
+    seed_username,
+)
+from grader.models import AnswerKey, Job, Setting, Submission, User
+from grader.urls import urlpatterns
+
+UPLOAD_ROWS = 100
+UPLOAD_SHEETS = 4
+
+
+def git_commit():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every route in grader/urls.py against seeded datasets of several "
+        "sizes and write the results as JSON. Seeded data is flushed before "
+        "each size; use a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[100, 1_000, 10_000],
+            help="Submissions per course for each run.",
+        )
+        parser.add_argument("--users", type=int, default=2)
+        parser.add_argument("--courses", type=int, default=5)
+        parser.add_argument("--questions", type=int, default=60)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Let reads be served from the response cache between repeats.",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the last seeded dataset."
+        )
+        parser.add_argument(
+            "--output", default="-", help="File to write JSON results to."
+        )
+
+    def handle(self, *args, **options):
+        report = {
+            "commit": git_commit(),
+            "createdAt": timezone.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "database": connection.vendor,
+            "options": {
+                name: options[name]
+                for name in ["users", "courses", "questions", "repeat", "seed", "warm"]
+            },
+            "runs": [],
+        }
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for size in options["sizes"]:
+                self.stderr.write(f"Seeding {size} submission(s) per course...")
+                call_command(
+                    "seed_grader",
+                    users=options["users"],
+                    courses=options["courses"],
+                    students=size,
+                    questions=options["questions"],
+                    seed=options["seed"],
+                    flush=True,
+                    stdout=StringIO(),
+                )
+                report["runs"].append(
+                    {
+                        "studentsPerCourse": size,
+                        "submissions": Submission.objects.count(),
+                        "routes": self.run_routes(options),
+                    }
+                )
+
+        if not options["keep"]:
+            User.objects.filter(username__startswith=SEED_USER_PREFIX).delete()
+
+        output = json.dumps(report, indent=2)
+        if options["output"] == "-":
+            self.stdout.write(output)
+        else:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+            self.stderr.write(f"Wrote {options['output']}")
+
+    def run_routes(self, options):
+        requests = self.requests(options["questions"])
+        results = []
+
+        for pattern in urlpatterns:
+            build = requests.get(pattern.name)
+            if build is None:
+                self.stderr.write(f"Skipping {pattern.name}: no benchmark request")
+                continue
+
+            timings = []
+            for _ in range(options["repeat"]):
+                # Building the request (and any fixtures it needs) is not timed
+                method, path, kwargs = build()
+                # Every request is anonymous, including the one after login
+                client = Client()
+                if not options["warm"]:
+                    cache.clear()
+                    response_cache.clear()
+
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = getattr(client, method)(path, **kwargs)
+                    if response.streaming:
+                        body = b"".join(response.streaming_content)
+                    else:
+                        body = response.content
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                # Jobs queued by the request are timed, not run
+                if response.status_code == 202:
+                    Job.objects.filter(pk=response.json()["jobId"]).delete()
+
+            results.append(
+                {
+                    "route": pattern.name,
+                    "pattern": str(pattern.pattern),
+                    "method": method.upper(),
+                    "status": response.status_code,
+                    "queries": len(queries),
+                    "bytes": len(body),
+                    "minMs": round(min(timings), 3),
+                    "medianMs": round(float(np.median(timings)), 3),
+                    "p95Ms": round(float(np.percentile(timings, 95)), 3),
+                }
+            )
+            self.stderr.write(
+                f"{pattern.name:>24} {results[-1]['medianMs']:>10.1f} ms "
+                f"{results[-1]['queries']:>4} queries"
+            )
+
+        self.job.delete()
+        return results
+
+    def requests(self, questions):
+        """
+        Map each route name to a function returning ``(method, path, kwargs)``
+        for one fresh request against the seeded data.
+        """
+        author = seed_username(0)
+        course = (
+            AnswerKey.objects.filter(author__username=author)
+            .select_related("setting")
+            .order_by("id")
+            .first()
+        )
+        params = {"id": author}
+        code = course.course_code
+        key_text = codec.decode(course.keys)
+        counter = itertools.count()
+        rng = np.random.default_rng(0)
+
+        def students(count):
+            first = 20_000_000 + next(counter) * count
+            return [
+                {
+                    "studentId": first + i,
+                    "studentName": f"Benchmark {i}",
+                    "answers": "".join(rng.choice(list(codec.CHOICES), questions)),
+                }
+                for i in range(count)
+            ]
+
+        def get(name, *args, query=None):
+            return lambda: ("get", reverse(name, args=args), {"data": query or params})
+
+        def similarity_check():
+            return (
+                "post",
+                reverse("course_similarity", args=[code]) + f"?id={author}",
+                {"data": {"top": 10}, "content_type": "application/json"},
+            )
+
+        def save_answer_key():
+            return (
+                "post",
+                reverse("saveAnswerKey"),
+                {
+                    "data": {
+                        "answerKey": key_text,
+                        "courseCode": f"BK{next(counter):06}",
+                        "courseName": "Benchmark",
+                        "numQuestions": questions,
+                        "markPerQuestion": 1,
+                        "negativeMarking": False,
+                        "negativePoints": 0.25,
+                        "totalMarks": questions,
+                        "gradingScale": "STD",
+                        "author": author,
+                    },
+                    "content_type": "application/json",
+                },
+            )
+
+        def save_students_answers():
+            return (
+                "post",
+                reverse("saveStudentsAnswers"),
+                {
+                    "data": {"students": students(UPLOAD_ROWS), "course_code": code},
+                    "content_type": "application/json",
+                },
+            )
+
+        def stream_students_answers():
+            body = "\n".join(json.dumps(row) for row in students(UPLOAD_ROWS))
+            return (
+                "post",
+                reverse("streamStudentsAnswers") + f"?course_code={code}",
+                {"data": body, "content_type": "application/x-ndjson"},
+            )
+
+        sheets = (
+            self.sheets(key_text)
+            if questions <= omr.DEFAULT_LAYOUT.max_questions
+            else None
+        )
+
+        def upload_sheets():
+            files = [BytesIO(sheet) for sheet in sheets]
+            for i, f in enumerate(files):
+                f.name = f"sheet-{i}.png"
+            return (
+                "post",
+                reverse("uploadSheets"),
+                {"data": {"course_code": code, "sheets": files}},
+            )
+
+        def login():
+            return (
+                "post",
+                reverse("login"),
+                {
+                    "data": {"email": author, "password": SEED_PASSWORD},
+                    "content_type": "application/json",
+                },
+            )
+
+        def register():
+            email = f"{SEED_USER_PREFIX}register-{next(counter)}@example.com"
+            return (
+                "post",
+                reverse("register"),
+                {
+                    "data": {
+                        "email": email,
+                        "password": SEED_PASSWORD,
+                        "confirmPassword": SEED_PASSWORD,
+                    },
+                    "content_type": "application/json",
+                },
+            )
+
+        def edit():
+            return (
+                "patch",
+                reverse("edit"),
+                {
+                    "data": {
+                        "id": course.id,
+                        "answerKey": key_text,
+                        "courseCode": code,
+                        "courseName": course.course_name,
+                        "numQuestions": course.no_of_questions,
+                        "negativeMarking": course.setting.negative_marking,
+                        "gradingScale": course.grading_scale,
+                        "totalMarks": course.total_marks,
+                        "author": author,
+                    },
+                    "content_type": "application/json",
+                },
+            )
+
+        def delete():
+            doomed = AnswerKey.objects.create(
+                author=course.author,
+                course_code=f"BD{next(counter):06}",
+                course_name="Benchmark",
+                no_of_questions=questions,
+                keys=course.keys,
+                mark_per_question=1,
+                total_marks=questions,
+            )
+            Setting.objects.create(answer_key=doomed)
+            return (
+                "post",
+                reverse("delete"),
+                {
+                    "data": {"id": doomed.id, "author": author},
+                    "content_type": "application/json",
+                },
+            )
+
+        # Finished already, so a running grader_worker never claims it
+        self.job = Job.objects.create(kind="grade_batch", state=Job.SUCCEEDED)
+
+        requests = {
+            "saveAnswerKey": save_answer_key,
+            "courses": get("courses"),
+            "course_submissions": get("course_submissions", code),
+            "course_summary": get("course_summary", code),
+            "course_submission_page": get("course_submission_page", code),
+            "course_distribution": get("course_distribution", code),
+            "course_item_analysis": get("course_item_analysis", code),
+            "course_export": get(
+                "course_export", code, query={**params, "type": "csv"}
+            ),
+            "distribution": get("distribution"),
+            "activity": get("activity", query={**params, "period": "week"}),
+            "course_similarity": similarity_check,
+            "student_transcript": get("student_transcript", FIRST_STUDENT_ID),
+            "saveStudentsAnswers": save_students_answers,
+            "streamStudentsAnswers": stream_students_answers,
+            "login": login,
+            "register": register,
+            "keys": get("keys", author),
+            "edit": edit,
+            "delete": delete,
+            "job": get("job", self.job.id),
+            "cacheStats": get("cacheStats"),
+        }
+        if sheets:
+            requests["uploadSheets"] = upload_sheets
+        return requests
+
+    def sheets(self, key_text):
+        """A few rendered answer sheets as PNG bytes, or ``None`` without Pillow."""
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+
+        sheets = []
+        for i in range(UPLOAD_SHEETS):
+            page = omr.render_sheet(30_000_000 + i, key_text, seed=i)
+            output = BytesIO()
+            Image.fromarray(page).save(output, format="PNG")
+            sheets.append(output.getvalue())
+        return sheets
@@ -0,0 +1,62 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from grader.engine import grade_batch, grade_student
+
+
+class Command(BaseCommand):
+    help = "Compare the batch grading engine with per-student grading."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1_000, 10_000, 100_000],
+            help="Cohort sizes to benchmark.",
+        )
+        parser.add_argument("--questions", type=int, default=60)
+        parser.add_argument("--negative-marking", action="store_true")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        questions = options["questions"]
+        negative_marking = options["negative_marking"]
+        points_deducted = 0.25
+
+        keys = "".join(rng.choice("ABCD") for _ in range(questions))
+
+        self.stdout.write(
+            f"{'students':>10} {'loop (s)':>10} {'batch (s)':>10} {'speedup':>8}"
+        )
+        for size in options["sizes"]:
+            answers = [
+                "".join(rng.choice("ABCDabcd ") for _ in range(questions))
+                for _ in range(size)
+            ]
+
+            start = time.perf_counter()
+            expected = [
+                grade_student(keys, a, questions, negative_marking, points_deducted)
+                for a in answers
+            ]
+            loop_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            graded = grade_batch(
+                keys, answers, questions, negative_marking, points_deducted
+            )
+            batch_time = time.perf_counter() - start
+
+            if [float(score) for score, _, _ in expected] != graded.scores or [
+                grade for _, _, grade in expected
+            ] != graded.grades:
+                self.stderr.write(f"Results differ at {size} students")
+
+            self.stdout.write(
+                f"{size:>10} {loop_time:>10.3f} {batch_time:>10.3f} "
+                f"{loop_time / batch_time:>7.1f}x"
+            )
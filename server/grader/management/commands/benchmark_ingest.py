@@ -0,0 +1,90 @@
+import json
+import time
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from grader.ingest import build_submissions, bulk_upsert_submissions, copy_submissions
+from grader.management.commands import seed_grader
+from grader.models import AnswerKey, CourseStats, Submission, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Time grading and inserting one large upload with each insert method "
+        "the database supports: bulk_create everywhere, COPY on PostgreSQL. "
+        "Run it once per DATABASE_ENGINE to compare backends. Seeded data is "
+        "flushed; use a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20_000)
+        parser.add_argument("--questions", type=int, default=60)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", action="store_true", help="Print JSON.")
+
+    def handle(self, *args, **options):
+        call_command(
+            "seed_grader",
+            users=1,
+            courses=1,
+            students=0,
+            questions=options["questions"],
+            seed=options["seed"],
+            flush=True,
+            stdout=StringIO(),
+        )
+        answer_key = AnswerKey.objects.select_related("setting").get(
+            course_code=seed_grader.seed_course_code(0, 0)
+        )
+        rng = np.random.default_rng(options["seed"])
+        rows = list(seed_grader.Command().students(rng, answer_key, options["rows"]))
+
+        methods = {"bulk_create": bulk_upsert_submissions}
+        if connection.vendor == "postgresql":
+            methods["copy"] = copy_submissions
+
+        results = []
+        for name, insert in methods.items():
+            timings = []
+            for _ in range(options["repeat"]):
+                Submission.objects.filter(associated_with=answer_key).delete()
+                CourseStats.objects.filter(answer_key=answer_key).delete()
+
+                start = time.perf_counter()
+                submissions = build_submissions(answer_key, answer_key.setting, rows)
+                with transaction.atomic():
+                    insert(submissions)
+                    CourseStats.objects.record(answer_key, submissions)
+                timings.append(time.perf_counter() - start)
+
+            seconds = float(np.median(timings))
+            results.append(
+                {
+                    "method": name,
+                    "rows": len(rows),
+                    "medianSeconds": round(seconds, 4),
+                    "rowsPerSecond": round(len(rows) / seconds),
+                }
+            )
+
+        User.objects.filter(username__startswith=seed_grader.SEED_USER_PREFIX).delete()
+
+        if options["json"]:
+            self.stdout.write(
+                json.dumps(
+                    {"database": connection.vendor, "results": results}, indent=2
+                )
+            )
+            return
+
+        self.stdout.write(f"{connection.vendor}: {len(rows)} row(s) per upload")
+        for r in results:
+            self.stdout.write(
+                f"{r['method']:>12} {r['medianSeconds']:>9.3f} s "
+                f"{r['rowsPerSecond']:>10} rows/s"
+            )
@@ -0,0 +1,62 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+
+from grader.codec import CHOICES, to_text
+from grader.omr import read_sheet, render_sheet
+
+
+class Command(BaseCommand):
+    help = "Measure bubble-sheet reading throughput on synthetic sheets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sheets", type=int, default=200)
+        parser.add_argument("--questions", type=int, default=60)
+        parser.add_argument(
+            "--workers",
+            nargs="+",
+            type=int,
+            default=[1, 2, 4],
+            help="Process pool sizes to measure.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        questions = options["questions"]
+
+        self.stdout.write(f"Rendering {options['sheets']} sheets...")
+        expected, pages = [], []
+        for i in range(options["sheets"]):
+            answers = "".join(rng.choice(CHOICES + " ") for _ in range(questions))
+            expected.append(answers)
+            pages.append(
+                render_sheet(
+                    10_000_000 + i,
+                    answers,
+                    angle=rng.uniform(-3, 3),
+                    noise=20,
+                    seed=i,
+                )
+            )
+
+        read = partial(read_sheet, questions=questions)
+        self.stdout.write(f"{'workers':>8} {'sheets/s':>10} {'per core':>10}")
+        for workers in options["workers"]:
+            start = time.perf_counter()
+            if workers == 1:
+                results = list(map(read, pages))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(read, pages, chunksize=8))
+            elapsed = time.perf_counter() - start
+
+            rate = len(pages) / elapsed
+            self.stdout.write(f"{workers:>8} {rate:>10.1f} {rate / workers:>10.1f}")
+
+        misread = sum(to_text(r.codes) != e for r, e in zip(results, expected))
+        if misread:
+            self.stderr.write(f"{misread} sheet(s) misread")
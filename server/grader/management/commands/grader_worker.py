@@ -0,0 +1,75 @@
+import os
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from grader.jobs import claim, run
+
+
+class Command(BaseCommand):
+    help = "Run queued grader jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.GRADER_WORKER_CONCURRENCY,
+            help="Number of jobs to run at once.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of waiting for more jobs.",
+        )
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        concurrency = max(1, options["concurrency"])
+
+        if concurrency == 1:
+            self.work(f"{name}:0", options)
+            return
+
+        threads = [
+            threading.Thread(target=self.work_in_thread, args=(f"{name}:{i}", options))
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+    def work_in_thread(self, worker, options):
+        try:
+            self.work(worker, options)
+        finally:
+            # Each thread has its own database connection
+            connection.close()
+
+    def work(self, worker, options):
+        while not self.stop.is_set():
+            job = claim(worker)
+            if job is None:
+                if options["once"]:
+                    break
+                self.stop.wait(options["poll_interval"])
+                continue
+
+            job = run(job)
+            self.stdout.write(f"[{worker}] {job}")
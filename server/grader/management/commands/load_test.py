@@ -0,0 +1,131 @@
+import asyncio
+import itertools
+import json
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from grader.management.commands.seed_grader import seed_course_code, seed_username
+
+API_PREFIX = "/api/user"
+
+
+async def fetch(host, port, path):
+    """One ``GET`` on a fresh connection; returns ``(status, seconds)``."""
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()  # the rest of the response, until the server closes
+    finally:
+        writer.close()
+    return int(status_line.split()[1]), time.perf_counter() - start
+
+
+async def run(host, port, paths, concurrency, total):
+    """Issue ``total`` requests with ``concurrency`` in flight at any time."""
+    issued = itertools.count()
+    latencies, failures = [], 0
+
+    async def client():
+        nonlocal failures
+        while (n := next(issued)) < total:
+            try:
+                status, seconds = await fetch(host, port, paths[n % len(paths)](n))
+            except OSError:
+                failures += 1
+                continue
+            if status != 200:
+                failures += 1
+            latencies.append(seconds)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return latencies, failures, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the read endpoints (courses, course/<code>, keys) of a running "
+        "server at several concurrency levels, e.g. the same seeded database "
+        "served by 'gunicorn server.wsgi' and by 'uvicorn server.asgi:application'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--author", default=seed_username(0))
+        parser.add_argument("--course", default=seed_course_code(0, 0))
+        parser.add_argument(
+            "--concurrency", nargs="+", type=int, default=[1, 8, 32, 64]
+        )
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Requests per level."
+        )
+        parser.add_argument(
+            "--cached",
+            action="store_true",
+            help="Let the response cache answer; by default every URL is unique.",
+        )
+        parser.add_argument("--json", action="store_true", help="Print JSON.")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError("--url must be an http:// URL")
+        host, port = url.hostname, url.port or 80
+
+        author, course = options["author"], options["course"]
+
+        def endpoint(path, **params):
+            def build(n):
+                query = {**params, **({} if options["cached"] else {"_": n})}
+                return f"{url.path.rstrip('/')}{API_PREFIX}/{path}?{urlencode(query)}"
+
+            return build
+
+        paths = [
+            endpoint("courses", id=author),
+            endpoint(f"course/{course}", id=author),
+            endpoint(f"keys/{author}"),
+        ]
+
+        results = []
+        for concurrency in options["concurrency"]:
+            latencies, failures, elapsed = asyncio.run(
+                run(host, port, paths, concurrency, options["requests"])
+            )
+            if not latencies:
+                raise CommandError(f"No request to {options['url']} succeeded")
+
+            ms = np.array(latencies) * 1000
+            results.append(
+                {
+                    "concurrency": concurrency,
+                    "requests": len(latencies),
+                    "failures": failures,
+                    "throughput": round(len(latencies) / elapsed, 2),
+                    "p50Ms": round(float(np.percentile(ms, 50)), 2),
+                    "p95Ms": round(float(np.percentile(ms, 95)), 2),
+                    "p99Ms": round(float(np.percentile(ms, 99)), 2),
+                }
+            )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'failed':>7}"
+        )
+        for r in results:
+            self.stdout.write(
+                f"{r['concurrency']:>8} {r['throughput']:>8.1f} {r['p50Ms']:>8.1f} "
+                f"{r['p95Ms']:>8.1f} {r['p99Ms']:>8.1f} {r['failures']:>7}"
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from grader.models import CourseStats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-course aggregate table from all submissions."
+
+    def handle(self, *args, **options):
+        count = CourseStats.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} course(s)"))
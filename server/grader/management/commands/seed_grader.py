@@ -0,0 +1,144 @@
+import time
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from grader import codec
+from grader.ingest import chunked, save_submissions
+from grader.models import AnswerKey, Setting, User
+
+SEED_USER_PREFIX = "seed-"
+SEED_PASSWORD = "seed-password"
+FIRST_STUDENT_ID = 10_000_000
+CHUNK_SIZE = 5_000
+
+
+def seed_username(index):
+    return f"{SEED_USER_PREFIX}{index}@example.com"
+
+
+def seed_course_code(user, course):
+    # Uploads look answer keys up by course code alone, so keep them unique
+    return f"SD{user:03}{course:03}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate reproducible synthetic users, answer keys and submissions. "
+        f"Seeded users are named {seed_username(0)!r} and so on, and log in "
+        f"with {SEED_PASSWORD!r}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=2)
+        parser.add_argument(
+            "--courses", type=int, default=5, help="Answer keys per user."
+        )
+        parser.add_argument(
+            "--students", type=int, default=1_000, help="Submissions per course."
+        )
+        parser.add_argument("--questions", type=int, default=60)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Delete previously seeded users and their data first.",
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        questions = options["questions"]
+        start = time.perf_counter()
+
+        if options["flush"]:
+            deleted, _ = User.objects.filter(
+                username__startswith=SEED_USER_PREFIX
+            ).delete()
+            self.stdout.write(f"Deleted {deleted} seeded row(s)")
+
+        # Hashing is deliberately slow, so every seeded user shares one hash
+        password = make_password(SEED_PASSWORD)
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                [
+                    User(
+                        username=seed_username(i),
+                        email=seed_username(i),
+                        password=password,
+                    )
+                    for i in range(options["users"])
+                ]
+            )
+            answer_keys = AnswerKey.objects.bulk_create(
+                [
+                    AnswerKey(
+                        author=user,
+                        course_code=seed_course_code(u, c),
+                        course_name=f"Seeded course {c}",
+                        no_of_questions=questions,
+                        grading_scale="STD",
+                        keys=codec.pack_codes(self.random_codes(rng, 1, questions))[0],
+                        mark_per_question=1,
+                        total_marks=questions,
+                    )
+                    for u, user in enumerate(users)
+                    for c in range(options["courses"])
+                ]
+            )
+            Setting.objects.bulk_create(
+                [
+                    Setting(
+                        answer_key=a,
+                        negative_marking=bool(rng.random() < 0.3),
+                    )
+                    for a in answer_keys
+                ]
+            )
+
+        saved = 0
+        for a in answer_keys:
+            for rows in chunked(self.students(rng, a, options["students"]), CHUNK_SIZE):
+                saved += save_submissions(a, a.setting, rows)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {len(users)} user(s), {len(answer_keys)} course(s) and "
+                f"{saved} submission(s) in {time.perf_counter() - start:.1f}s"
+            )
+        )
+
+    @staticmethod
+    def random_codes(rng, rows, questions):
+        return (1 << rng.integers(0, len(codec.CHOICES), (rows, questions))).astype(
+            np.uint8
+        )
+
+    def students(self, rng, answer_key, count):
+        """
+        Yield ``(student_id, name, answers)`` rows. Each student has an ability
+        that sets how often they match the key; the rest are random or blank.
+        The same student IDs sit every course, as real cohorts do.
+        """
+        questions = answer_key.no_of_questions
+        key = codec.unpack([answer_key.keys], questions)[0]
+        # Indexed by code: 0 is blank, 1/2/4/8 are A-D
+        letters = np.frombuffer(b" AB C   D", dtype=np.uint8)
+
+        for offset in range(0, count, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, count - offset)
+            ability = rng.beta(5, 3, (size, 1))
+            guesses = self.random_codes(rng, size, questions)
+            codes = np.where(rng.random((size, questions)) < ability, key, guesses)
+            codes[rng.random((size, questions)) < 0.02] = codec.BLANK
+
+            data = letters[codes].tobytes().decode("ascii")
+
+            for i in range(size):
+                student_id = FIRST_STUDENT_ID + offset + i
+                yield (
+                    student_id,
+                    f"Student {student_id}",
+                    data[i * questions : (i + 1) * questions],
+                )
@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+from collections import Counter
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from grader.ingest import save_submissions, write_queue
+from grader.management.commands import seed_grader
+from grader.models import AnswerKey, Submission, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Upload submission batches from many threads at once and report any "
+        "that fail, e.g. with 'database is locked'. Compare SQLITE_PRODUCTION "
+        "and GRADER_WRITE_QUEUE on and off. Seeded data is flushed; use a "
+        "scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--uploads", type=int, default=10, help="Uploads per thread."
+        )
+        parser.add_argument("--rows", type=int, default=200, help="Rows per upload.")
+        parser.add_argument("--questions", type=int, default=60)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", action="store_true", help="Print JSON.")
+
+    def handle(self, *args, **options):
+        call_command(
+            "seed_grader",
+            users=1,
+            courses=1,
+            students=0,
+            questions=options["questions"],
+            seed=options["seed"],
+            flush=True,
+            stdout=StringIO(),
+        )
+        a = AnswerKey.objects.select_related("setting").get(
+            course_code=seed_grader.seed_course_code(0, 0)
+        )
+        s = a.setting
+
+        threads, uploads, size = options["threads"], options["uploads"], options["rows"]
+        rng = np.random.default_rng(options["seed"])
+        rows = list(seed_grader.Command().students(rng, a, threads * uploads * size))
+        batches = [rows[i : i + size] for i in range(0, len(rows), size)]
+
+        barrier = threading.Barrier(threads)
+        errors = Counter()
+        saved = []
+        before = write_queue.stats()
+
+        def upload(mine):
+            barrier.wait()
+            try:
+                for batch in mine:
+                    try:
+                        saved.append(save_submissions(a, s, batch))
+                    except DatabaseError as error:
+                        errors[str(error)] += 1
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=upload, args=(batches[i::threads],))
+            for i in range(threads)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        after = write_queue.stats()
+        with connection.cursor() as cursor:
+            journal_mode = (
+                cursor.execute("PRAGMA journal_mode").fetchone()[0]
+                if connection.vendor == "sqlite"
+                else None
+            )
+        report = {
+            "database": connection.vendor,
+            "journalMode": journal_mode,
+            "uploads": len(batches),
+            "failed": sum(errors.values()),
+            "errors": dict(errors),
+            "saved": sum(saved),
+            "stored": Submission.objects.filter(associated_with=a).count(),
+            "seconds": round(elapsed, 3),
+            "rowsPerSecond": round(sum(saved) / elapsed),
+            "transactions": after["transactions"] - before["transactions"],
+        }
+
+        User.objects.filter(username__startswith=seed_grader.SEED_USER_PREFIX).delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['uploads'] - report['failed']}/{report['uploads']} upload(s) "
+            f"saved, {report['saved']} row(s) in {report['seconds']:.2f}s "
+            f"({report['rowsPerSecond']} rows/s); "
+            f"{report['transactions']} queued transaction(s)"
+        )
+        for message, count in errors.most_common():
+            self.stdout.write(self.style.ERROR(f"{count} x {message}"))
@@ -0,0 +1,348 @@
+"""
+Per-route request metrics in the Prometheus text format.
+
+``MetricsMiddleware`` times every request and counts the SQL it runs through a
+database execute wrapper, then folds the observations into fixed-bucket
+histograms keyed by the resolved URL name. Recording is a few dict lookups
+and a bisect under a lock.
+
+Each process keeps its own registry. With several worker processes (gunicorn)
+set ``GRADER_METRICS_DIR`` to a directory shared by all of them: every process
+writes a snapshot of its registry there at most every
+``GRADER_METRICS_FLUSH_INTERVAL`` seconds and on exit, and ``/metrics`` adds up
+the snapshots. Snapshot files are per process and never reused, so counts
+from workers that have exited are kept; clear the directory when the server
+is redeployed.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+HISTOGRAMS = {
+    "grader_http_request_duration_seconds": (
+        "Wall time spent handling the request.",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    "grader_http_request_sql_queries": (
+        "SQL queries run while handling the request.",
+        (0, 1, 2, 5, 10, 20, 50, 100, 500),
+    ),
+    "grader_http_request_sql_duration_seconds": (
+        "Time spent in SQL while handling the request.",
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+    ),
+    "grader_http_response_size_bytes": (
+        "Size of the response body.",
+        (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000),
+    ),
+}
+REQUESTS_TOTAL = "grader_http_requests_total"
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)
+        # route -> per-bucket counts (the last is +Inf), then sum
+        self.histograms = {name: {} for name in HISTOGRAMS}
+
+    def observe(self, route, method, status, values):
+        """Record one request; ``values`` maps histogram name to observation."""
+        with self.lock:
+            self.requests[(route, method, str(status))] += 1
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                series = self.histograms[name].get(route)
+                if series is None:
+                    series = self.histograms[name][route] = [0] * (len(buckets) + 2)
+                series[bisect_left(buckets, value)] += 1
+                series[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": [[*key, count] for key, count in self.requests.items()],
+                "histograms": {
+                    name: {route: list(series) for route, series in routes.items()}
+                    for name, routes in self.histograms.items()
+                },
+            }
+
+    def clear(self):
+        with self.lock:
+            self.requests.clear()
+            for routes in self.histograms.values():
+                routes.clear()
+
+
+def merge(snapshots):
+    """Add up registry snapshots from several processes."""
+    requests = defaultdict(int)
+    histograms = {name: {} for name in HISTOGRAMS}
+
+    for snapshot in snapshots:
+        for *key, count in snapshot["requests"]:
+            requests[tuple(key)] += count
+        for name, routes in snapshot["histograms"].items():
+            if name not in histograms:
+                continue
+            for route, series in routes.items():
+                total = histograms[name].setdefault(route, [0] * len(series))
+                for i, value in enumerate(series):
+                    total[i] += value
+
+    return requests, histograms
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _bound(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+def render(snapshots):
+    """Prometheus text exposition of the merged ``snapshots``."""
+    requests, histograms = merge(snapshots)
+    lines = [
+        f"# HELP {REQUESTS_TOTAL} Requests handled, by route, method and status.",
+        f"# TYPE {REQUESTS_TOTAL} counter",
+    ]
+    for (route, method, status), count in sorted(requests.items()):
+        lines.append(
+            f'{REQUESTS_TOTAL}{{route="{_label(route)}",method="{_label(method)}",'
+            f'status="{_label(status)}"}} {count}'
+        )
+
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+        for route, series in sorted(histograms[name].items()):
+            label = f'route="{_label(route)}"'
+            cumulative = 0
+            for bound, count in zip([*buckets, float("inf")], series):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{{label},le="{_bound(bound)}"}} {cumulative}'
+                )
+            lines.append(f"{name}_sum{{{label}}} {series[-1]}")
+            lines.append(f"{name}_count{{{label}}} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+class SnapshotWriter:
+    """Periodically persist this process's registry for multi-process scraping."""
+
+    def __init__(self, registry, directory, interval):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.pid = os.getpid()
+        self.path = os.path.join(directory, f"metrics-{self.pid}-{time.time_ns()}.json")
+        self.flushed = 0.0
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.close)
+
+    def maybe_flush(self):
+        if time.monotonic() - self.flushed >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.flushed = time.monotonic()
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.registry.snapshot(), f)
+        os.replace(temporary, self.path)
+
+    def close(self):
+        try:
+            self.flush()
+        except OSError:
+            pass  # the directory went away first; nothing to keep
+
+    def read_all(self):
+        """Snapshots of every process, with this process's taken live."""
+        snapshots = [self.registry.snapshot()]
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json") or entry.path == self.path:
+                continue
+            try:
+                with open(entry.path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # replaced or half-written mid-read
+        return snapshots
+
+
+registry = Registry()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    directory = settings.GRADER_METRICS_DIR
+    if not directory:
+        return None
+
+    with _writer_lock:
+        if _writer is not None and _writer.pid != os.getpid():
+            # A forked worker starts from zero in a file of its own
+            registry.clear()
+            _writer = None
+        if _writer is not None and _writer.directory != directory:
+            atexit.unregister(_writer.close)
+            _writer = None
+        if _writer is None:
+            _writer = SnapshotWriter(
+                registry, directory, settings.GRADER_METRICS_FLUSH_INTERVAL
+            )
+    return _writer
+
+
+def collect():
+    writer = _get_writer()
+    if writer is None:
+        return render([registry.snapshot()])
+    return render(writer.read_all())
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and the time spent in them."""
+
+    __slots__ = ("queries", "duration")
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.duration += time.perf_counter() - start
+
+
+def _install(timer):
+    connection.execute_wrappers.append(timer)
+
+
+def _uninstall(timer):
+    if timer in connection.execute_wrappers:
+        connection.execute_wrappers.remove(timer)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timer = QueryTimer()
+        start = time.perf_counter()
+        _install(timer)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            _uninstall(timer)
+            raise
+
+        if response.streaming:
+            # The body, and any queries it runs, are produced after we return
+            return self.observe_stream(request, response, timer, start)
+
+        _uninstall(timer)
+        self.observe(request, response, timer, start, len(response.content))
+        return response
+
+    async def __acall__(self, request):
+        # Database connections are per thread, and the async ORM runs a
+        # request's queries on that request's sync thread: install the
+        # wrapper there
+        timer = QueryTimer()
+        start = time.perf_counter()
+        await sync_to_async(_install)(timer)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await sync_to_async(_uninstall)(timer)
+            raise
+
+        if response.streaming:
+            return self.observe_stream(request, response, timer, start)
+
+        await sync_to_async(_uninstall)(timer)
+        self.observe(request, response, timer, start, len(response.content))
+        return response
+
+    def observe_stream(self, request, response, timer, start):
+        content = response.streaming_content
+
+        def done(size):
+            self.observe(request, response, timer, start, size)
+
+        if response.is_async:
+
+            async def measured():
+                size = 0
+                try:
+                    async for chunk in content:
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    await sync_to_async(_uninstall)(timer)
+                    done(size)
+
+        else:
+
+            def measured():
+                # Under ASGI this runs on the request's sync thread
+                size = 0
+                try:
+                    for chunk in content:
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    _uninstall(timer)
+                    done(size)
+
+        response.streaming_content = measured()
+        return response
+
+    def observe(self, request, response, timer, start, size):
+        match = request.resolver_match
+        route = (match.url_name or match.view_name) if match else "unmatched"
+        registry.observe(
+            route,
+            request.method,
+            response.status_code,
+            {
+                "grader_http_request_duration_seconds": time.perf_counter() - start,
+                "grader_http_request_sql_queries": timer.queries,
+                "grader_http_request_sql_duration_seconds": timer.duration,
+                "grader_http_response_size_bytes": size,
+            },
+        )
+
+        writer = _get_writer()
+        if writer is not None:
+            writer.maybe_flush()
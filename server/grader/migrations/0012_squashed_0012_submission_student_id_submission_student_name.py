@@ -0,0 +1,31 @@
+# Replaces 0012 on databases that have not applied it yet. Its one-off default
+# for existing rows, 4211231199, is out of range for a PostgreSQL integer, so
+# 0012 cannot run there; any default will do on a fresh database, which has no
+# submissions to fill in. Databases that already applied 0012 skip this one.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    replaces = [
+        ('grader', '0012_submission_student_id_submission_student_name'),
+    ]
+
+    dependencies = [
+        ('grader', '0011_remove_submission_student_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='student_id',
+            field=models.IntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='student_name',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
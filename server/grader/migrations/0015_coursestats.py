@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def build_course_stats(apps, schema_editor):
+    Submission = apps.get_model("grader", "Submission")
+    CourseStats = apps.get_model("grader", "CourseStats")
+
+    rows = (
+        Submission.objects.values("associated_with_id")
+        .annotate(
+            submission_count=Count("id"),
+            score_sum=Sum("score"),
+            pass_count=Count("id", filter=Q(grade__in=["A", "B", "C", "D", "E"])),
+            max_score=Max("score"),
+            last_activity=Max("updated_at"),
+        )
+        .order_by()
+    )
+    CourseStats.objects.bulk_create(
+        CourseStats(answer_key_id=row.pop("associated_with_id"), **row) for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grader', '0014_submission_percentage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submission_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0.0)),
+                ('pass_count', models.PositiveIntegerField(default=0)),
+                ('max_score', models.FloatField(default=0.0)),
+                ('last_activity', models.DateTimeField(blank=True, null=True)),
+                ('answer_key', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='grader.answerkey')),
+            ],
+            options={
+                'verbose_name_plural': 'course stats',
+            },
+        ),
+        migrations.RunPython(build_course_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+# Stores AnswerKey.keys and Submission.answers in the packed format described
+# in grader.codec. The encoding is inlined so this migration does not change
+# if the codec module does.
+
+from django.db import migrations, models
+
+CHOICES = "ABCD"
+
+
+def pack(text):
+    codes = [1 << CHOICES.index(c) if c in CHOICES else 0 for c in text.upper()]
+    if len(codes) % 2:
+        codes.append(0)
+    body = bytes(codes[i] | (codes[i + 1] << 4) for i in range(0, len(codes), 2))
+    return len(text).to_bytes(2, "little") + body
+
+
+def unpack(packed):
+    packed = bytes(packed)
+    count = int.from_bytes(packed[:2], "little")
+    chars = []
+    for byte in packed[2:]:
+        for code in (byte & 0x0F, byte >> 4):
+            chars.append(
+                CHOICES[code.bit_length() - 1] if code in (1, 2, 4, 8) else " "
+            )
+    return "".join(chars[:count])
+
+
+def convert(apps, source, target, transform):
+    for model_name, field in [("AnswerKey", "keys"), ("Submission", "answers")]:
+        Model = apps.get_model("grader", model_name)
+        batch = []
+        for obj in Model.objects.only("id", f"{source}{field}").iterator(
+            chunk_size=2000
+        ):
+            setattr(
+                obj, f"{target}{field}", transform(getattr(obj, f"{source}{field}"))
+            )
+            batch.append(obj)
+            if len(batch) == 2000:
+                Model.objects.bulk_update(batch, [f"{target}{field}"])
+                batch = []
+        Model.objects.bulk_update(batch, [f"{target}{field}"])
+
+
+def pack_answers(apps, schema_editor):
+    convert(apps, "", "packed_", pack)
+
+
+def unpack_answers(apps, schema_editor):
+    convert(apps, "packed_", "", unpack)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grader', '0016_submission_course_recent_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answerkey',
+            name='packed_keys',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='packed_answers',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(pack_answers, unpack_answers),
+        # Defaults let the text columns be re-added when migrating backwards
+        migrations.AlterField(
+            model_name='answerkey',
+            name='keys',
+            field=models.TextField(default='', verbose_name='Answer keys'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='answers',
+            field=models.TextField(default='', verbose_name='Answer keys'),
+        ),
+        migrations.RemoveField(
+            model_name='answerkey',
+            name='keys',
+        ),
+        migrations.RemoveField(
+            model_name='submission',
+            name='answers',
+        ),
+        migrations.RenameField(
+            model_name='answerkey',
+            old_name='packed_keys',
+            new_name='keys',
+        ),
+        migrations.RenameField(
+            model_name='submission',
+            old_name='packed_answers',
+            new_name='answers',
+        ),
+        migrations.AlterField(
+            model_name='answerkey',
+            name='keys',
+            field=models.BinaryField(verbose_name='Answer keys'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='answers',
+            field=models.BinaryField(verbose_name='Answer keys'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grader', '0018_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['associated_with', 'percentage', 'grade'], name='submission_distribution'),
+        ),
+    ]
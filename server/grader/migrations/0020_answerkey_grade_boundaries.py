@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grader', '0019_submission_distribution_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answerkey',
+            name='grade_boundaries',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grader', '0020_answerkey_grade_boundaries'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['student_id', 'associated_with'], name='submission_student'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:58
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+# Passing grades of the built-in scales as of this migration, inlined so it
+# does not change if grader.engine does. Custom scales list their own bands.
+PASSING = {
+    "STD": {"A", "B", "C", "D", "E"},
+    "NUM": {str(p) for p in range(50, 101)},
+}
+
+
+def passing_grades(grading_scale, custom):
+    if grading_scale in PASSING:
+        return PASSING[grading_scale]
+    if not isinstance(custom, list):
+        return set()
+    return {
+        str(band["grade"])
+        for band in custom
+        if isinstance(band, dict) and "grade" in band and band.get("passing")
+    }
+
+
+def drop_duplicate_submissions(apps, schema_editor):
+    """Keep only each student's latest submission per course."""
+    Submission = apps.get_model("grader", "Submission")
+    AnswerKey = apps.get_model("grader", "AnswerKey")
+    CourseStats = apps.get_model("grader", "CourseStats")
+
+    duplicates = (
+        Submission.objects.values("associated_with_id", "student_id")
+        .annotate(count=Count("id"), latest=Max("id"))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    courses = set()
+    for row in duplicates.iterator():
+        Submission.objects.filter(
+            associated_with_id=row["associated_with_id"],
+            student_id=row["student_id"],
+            id__lt=row["latest"],
+        ).delete()
+        courses.add(row["associated_with_id"])
+
+    for key in AnswerKey.objects.filter(id__in=courses):
+        passing = passing_grades(key.grading_scale, key.grade_boundaries)
+        totals = Submission.objects.filter(associated_with_id=key.id).aggregate(
+            submission_count=Count("id"),
+            score_sum=Sum("score"),
+            pass_count=Count("id", filter=Q(grade__in=passing)),
+            max_score=Max("score"),
+            last_activity=Max("updated_at"),
+        )
+        CourseStats.objects.update_or_create(answer_key_id=key.id, defaults=totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grader', '0021_submission_student_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_submissions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(fields=('associated_with', 'student_id'), name='unique_course_student'),
+        ),
+    ]
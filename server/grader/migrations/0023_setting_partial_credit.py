@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grader', '0022_submission_unique_course_student'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='setting',
+            name='partial_credit',
+            field=models.BooleanField(default=False),
+        ),
+    ]
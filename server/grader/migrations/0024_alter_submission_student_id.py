@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grader', '0023_setting_partial_credit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='student_id',
+            field=models.BigIntegerField(),
+        ),
+    ]
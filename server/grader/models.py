@@ -1,7 +1,14 @@
+from collections import defaultdict
 from decimal import Decimal
 
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from . import activity
+from .cache import response_cache
+from .engine import get_scale
 
 
 class User(AbstractUser):
@@ -31,7 +38,9 @@ class AnswerKey(models.Model):
         choices=GRADING_SCALE_CHOICES,
         default="STD",
     )
-    keys = models.TextField("Answer keys")
+    # Bands of a custom ("CUS") scale, see grader.engine.parse_scale
+    grade_boundaries = models.JSONField(null=True, blank=True)
+    keys = models.BinaryField("Answer keys")  # packed, see grader.codec
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     mark_per_question = models.IntegerField()
@@ -51,6 +60,11 @@ class AnswerKey(models.Model):
     def __str__(self):
         return f"{self.course_code} - {self.course_name} | {self.no_of_questions} Qs | by {self.author.username}"
 
+    @property
+    def scale(self):
+        """The compiled grading scale; compilation is cached per distinct scale."""
+        return get_scale(self.grading_scale, self.grade_boundaries)
+
 
 class Setting(models.Model):
     answer_key = models.OneToOneField(
@@ -63,6 +77,8 @@ class Setting(models.Model):
         max_digits=5,
         default=Decimal("0.25"),
     )
+    # Multi-select questions earn a share of the mark per correct option
+    partial_credit = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -74,21 +90,231 @@ class Setting(models.Model):
         )
 
 
+class SubmissionManager(models.Manager):
+    def regrade(self, answer_key):
+        """
+        Re-derive the grade of every stored submission for ``answer_key`` from
+        its percentage, in a single UPDATE, and refresh the course totals.
+        """
+        bands = answer_key.scale.bands()
+        grade = Case(
+            *[
+                When(percentage__gte=minimum, then=Value(label))
+                for label, minimum in bands[:-1]
+            ],
+            default=Value(bands[-1][0]),
+        )
+
+        with transaction.atomic():
+            updated = self.filter(associated_with=answer_key).update(grade=grade)
+            CourseStats.objects.refresh(answer_key)
+        return updated
+
+
 class Submission(models.Model):
-    student_id = models.IntegerField(null=False, blank=False)
+    student_id = models.BigIntegerField(null=False, blank=False)
     student_name = models.TextField(null=True, blank=True)
     associated_with = models.ForeignKey(
         AnswerKey, on_delete=models.CASCADE, related_name="submissions"
     )
-    answers = models.TextField("Answer keys")
+    answers = models.BinaryField("Answer keys")  # packed, see grader.codec
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     score = models.FloatField(default=0)
     percentage = models.FloatField(default=0.0)
     grade = models.CharField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["associated_with", "updated_at", "id"],
+                name="submission_course_recent",
+            ),
+            models.Index(
+                fields=["associated_with", "percentage", "grade"],
+                name="submission_distribution",
+            ),
+            models.Index(
+                fields=["student_id", "associated_with"],
+                name="submission_student",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["associated_with", "student_id"],
+                name="unique_course_student",
+            ),
+        ]
+
+    objects = SubmissionManager()
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super().save(*args, **kwargs)
+
+        if created:
+            CourseStats.objects.record(self.associated_with, [self])
+        else:
+            CourseStats.objects.refresh(self.associated_with)
+            # The row left whichever activity bucket it was in
+            activity.forget(self.associated_with.author.username)
+        self._bump_responses()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        CourseStats.objects.refresh(self.associated_with)
+        activity.forget(self.associated_with.author.username)
+        self._bump_responses()
+        return result
+
+    def _bump_responses(self):
+        author = self.associated_with.author.username
+        course_code = self.associated_with.course_code
+        transaction.on_commit(lambda: response_cache.bump(author, course_code))
+
     def __str__(self):
         return (
             f"{self.student_name or self.student_id} | {self.associated_with.course_code} | "
             f"Score: {self.score} ({self.percentage}%) Grade: {self.grade}"
         )
+
+
+def _stats_aggregates():
+    return {
+        "submission_count": Count("id"),
+        "score_sum": Coalesce(Sum("score"), Value(0.0)),
+        "max_score": Coalesce(Max("score"), Value(0.0)),
+        "last_activity": Max("updated_at"),
+    }
+
+
+class CourseStatsManager(models.Manager):
+    def record(self, answer_key, submissions):
+        """Fold newly inserted ``submissions`` into the course's running totals."""
+        if not submissions:
+            return
+
+        passing = answer_key.scale.passing
+        max_score = max(s.score for s in submissions)
+        last_activity = max(s.updated_at for s in submissions)
+
+        self.get_or_create(answer_key_id=answer_key.id)
+        self.filter(answer_key_id=answer_key.id).update(
+            submission_count=F("submission_count") + len(submissions),
+            score_sum=F("score_sum") + sum(s.score for s in submissions),
+            pass_count=F("pass_count") + sum(s.grade in passing for s in submissions),
+            max_score=Greatest(F("max_score"), Value(max_score)),
+            last_activity=Coalesce(
+                Greatest(F("last_activity"), Value(last_activity)),
+                Value(last_activity),
+            ),
+        )
+
+    def refresh(self, answer_key):
+        """Recompute one course's totals after an update, delete or regrade."""
+        totals = Submission.objects.filter(associated_with=answer_key).aggregate(
+            **_stats_aggregates(),
+            pass_count=Count("id", filter=Q(grade__in=answer_key.scale.passing)),
+        )
+
+        self.update_or_create(answer_key_id=answer_key.id, defaults=totals)
+
+    def rebuild(self):
+        """
+        Drop and recompute every course's totals from one query grouped by
+        course and grade; which grades pass depends on each course's scale.
+        """
+        rows = (
+            Submission.objects.values("associated_with_id", "grade")
+            .annotate(**_stats_aggregates())
+            .order_by()
+        )
+        keys = AnswerKey.objects.only("grading_scale", "grade_boundaries").in_bulk()
+
+        stats = {}
+        for row in rows:
+            key_id, grade = row.pop("associated_with_id"), row.pop("grade")
+            passed = (
+                row["submission_count"] if grade in keys[key_id].scale.passing else 0
+            )
+            course = stats.get(key_id)
+            if course is None:
+                stats[key_id] = CourseStats(
+                    answer_key_id=key_id, pass_count=passed, **row
+                )
+                continue
+
+            course.submission_count += row["submission_count"]
+            course.score_sum += row["score_sum"]
+            course.pass_count += passed
+            course.max_score = max(course.max_score, row["max_score"])
+            course.last_activity = max(course.last_activity, row["last_activity"])
+
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(stats.values(), batch_size=500)
+
+        # Any course's totals may have changed
+        courses = defaultdict(list)
+        for author, course_code in AnswerKey.objects.values_list(
+            "author__username", "course_code"
+        ):
+            courses[author].append(course_code)
+        for author, course_codes in courses.items():
+            response_cache.bump(author, *course_codes)
+
+        return len(stats)
+
+
+class CourseStats(models.Model):
+    answer_key = models.OneToOneField(
+        AnswerKey, on_delete=models.CASCADE, related_name="stats"
+    )
+    submission_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0.0)
+    pass_count = models.PositiveIntegerField(default=0)
+    max_score = models.FloatField(default=0.0)
+    last_activity = models.DateTimeField(null=True, blank=True)
+
+    objects = CourseStatsManager()
+
+    class Meta:
+        verbose_name_plural = "course stats"
+
+    def __str__(self):
+        return f"Stats for {self.answer_key.course_code}: {self.submission_count} submissions"
+
+
+class Job(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATE_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=QUEUED)
+    payload = models.JSONField(default=dict)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["state", "created_at"], name="job_queue"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.state}, {self.progress}/{self.total})"  # type: ignore
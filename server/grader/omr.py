@@ -0,0 +1,381 @@
+"""
+Optical mark recognition for printed bubble sheets.
+
+A sheet has four square fiducials at its corners, a block of student-ID digit
+bubbles and a grid of answer bubbles, all placed by ``SheetLayout``. Reading
+a page is done entirely on NumPy arrays:
+
+1. threshold the greyscale page into an ink mask and build its integral image;
+2. find the fiducials with a box filter in each corner, and fit the affine
+   transform from layout to page coordinates (this absorbs skew, rotation
+   and scale, so the page itself is never resampled);
+3. measure how much of every bubble is inked with four integral-image
+   lookups per bubble, vectorised over the whole sheet.
+
+Runs of pages are fanned out to a process pool. Decoding uploads needs Pillow, and
+PDFs additionally need pypdfium2; both are optional.
+"""
+
+import io
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+
+from . import codec
+
+# Share of a bubble's inner window that must be inked to count as marked
+FILL_THRESHOLD = 0.45
+INK_THRESHOLD = 128
+
+
+class OMRError(ValueError):
+    pass
+
+
+class SheetLayout(NamedTuple):
+    """Bubble sheet geometry, in pixels of an unrotated page at scale 1."""
+
+    width: int = 850
+    height: int = 1100
+    marker_size: int = 40
+    marker_inset: int = 60
+    bubble_radius: int = 10
+    id_digits: int = 8
+    id_origin: tuple = (150, 130)
+    id_spacing: tuple = (30, 28)
+    questions_per_column: int = 20
+    answer_columns: int = 3
+    answer_origin: tuple = (150, 460)
+    answer_spacing: tuple = (35, 28)
+    column_spacing: int = 220
+
+    @property
+    def max_questions(self):
+        return self.questions_per_column * self.answer_columns
+
+    def markers(self):
+        """Fiducial centres: top-left, top-right, bottom-left, bottom-right."""
+        near, far_x, far_y = (
+            self.marker_inset,
+            self.width - self.marker_inset,
+            self.height - self.marker_inset,
+        )
+        return np.array(
+            [[near, near], [far_x, near], [near, far_y], [far_x, far_y]],
+            dtype=np.float64,
+        )
+
+    def id_bubbles(self):
+        """``(id_digits, 10, 2)`` array of digit bubble centres."""
+        x0, y0 = self.id_origin
+        dx, dy = self.id_spacing
+        digit, value = np.meshgrid(
+            np.arange(self.id_digits), np.arange(10), indexing="ij"
+        )
+        return np.stack([x0 + digit * dx, y0 + value * dy], axis=-1).astype(np.float64)
+
+    def answer_bubbles(self, questions):
+        """``(questions, len(CHOICES), 2)`` array of answer bubble centres."""
+        if questions > self.max_questions:
+            raise OMRError(f"Layout holds at most {self.max_questions} questions")
+
+        x0, y0 = self.answer_origin
+        dx, dy = self.answer_spacing
+        question, choice = np.meshgrid(
+            np.arange(questions), np.arange(len(codec.CHOICES)), indexing="ij"
+        )
+        column, row = np.divmod(question, self.questions_per_column)
+        x = x0 + column * self.column_spacing + choice * dx
+        y = y0 + row * dy
+        return np.stack([x, y], axis=-1).astype(np.float64)
+
+
+DEFAULT_LAYOUT = SheetLayout()
+
+
+class SheetResult(NamedTuple):
+    student_id: int
+    codes: np.ndarray
+
+
+def _integral(mask):
+    integral = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(mask, axis=0, dtype=np.int32), axis=1, out=integral[1:, 1:])
+    return integral
+
+
+def _box_sums(integral, x0, y0, x1, y1):
+    return integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+
+
+def _find_markers(integral, layout, scale):
+    height, width = integral.shape[0] - 1, integral.shape[1] - 1
+    size = max(3, int(layout.marker_size * scale * 0.8))
+    markers = []
+
+    if min(width, height) // 3 <= size:
+        raise OMRError("Page is too small to locate the corner markers")
+
+    for right, bottom in [(False, False), (True, False), (False, True), (True, True)]:
+        # Search the outer third of the page in each corner
+        xs = np.arange(0, width // 3 - size)
+        ys = np.arange(0, height // 3 - size)
+        if right:
+            xs = xs + width - width // 3
+        if bottom:
+            ys = ys + height - height // 3
+
+        x0, y0 = np.meshgrid(xs, ys)
+        sums = _box_sums(integral, x0, y0, x0 + size, y0 + size)
+        best = sums.max()
+
+        if best < 0.8 * size * size:
+            raise OMRError("Could not locate the corner markers")
+
+        # The window fits inside the marker at several offsets; use their centre
+        plateau = sums >= best * 0.98
+        markers.append([x0[plateau].mean() + size / 2, y0[plateau].mean() + size / 2])
+
+    return np.array(markers, dtype=np.float64)
+
+
+def _fit_affine(source, target):
+    """Least-squares affine map taking ``source`` points onto ``target``."""
+    design = np.hstack([source, np.ones((len(source), 1))])
+    transform, *_ = np.linalg.lstsq(design, target, rcond=None)
+    return transform
+
+
+def _fill_ratios(integral, points, half):
+    shape = points.shape[:-1]
+    x, y = points.reshape(-1, 2).T
+    height, width = integral.shape[0] - 1, integral.shape[1] - 1
+
+    x0 = np.clip(np.rint(x - half), 0, width).astype(np.intp)
+    x1 = np.clip(np.rint(x + half), 0, width).astype(np.intp)
+    y0 = np.clip(np.rint(y - half), 0, height).astype(np.intp)
+    y1 = np.clip(np.rint(y + half), 0, height).astype(np.intp)
+
+    area = np.maximum((x1 - x0) * (y1 - y0), 1)
+    return (_box_sums(integral, x0, y0, x1, y1) / area).reshape(shape)
+
+
+def read_sheet(page, questions, layout=DEFAULT_LAYOUT):
+    """
+    Read one greyscale page (2-D uint8 array, dark ink on light paper).
+
+    Returns a ``SheetResult`` with the student ID and one answer code per
+    question. Questions with no mark, or with more than one, read as blank.
+    """
+    if page.ndim != 2:
+        raise OMRError("Expected a greyscale page")
+
+    integral = _integral(page < INK_THRESHOLD)
+    scale = page.shape[1] / layout.width
+
+    markers = _find_markers(integral, layout, scale)
+    transform = _fit_affine(layout.markers(), markers)
+
+    def locate(points):
+        flat = points.reshape(-1, 2)
+        placed = np.hstack([flat, np.ones((len(flat), 1))]) @ transform
+        return placed.reshape(points.shape)
+
+    # Only the inside of each bubble, so the printed outline does not count
+    half = layout.bubble_radius * scale * 0.55
+    id_fill = _fill_ratios(integral, locate(layout.id_bubbles()), half)
+    answer_fill = _fill_ratios(integral, locate(layout.answer_bubbles(questions)), half)
+
+    id_marked = id_fill > FILL_THRESHOLD
+    if (id_marked.sum(axis=1) != 1).any():
+        raise OMRError("Student ID is incomplete or has more than one mark per digit")
+    digits = id_marked.argmax(axis=1)
+    student_id = int("".join(str(d) for d in digits))
+
+    marked = answer_fill > FILL_THRESHOLD
+    single = marked.sum(axis=1) == 1
+    codes = np.where(single, 1 << marked.argmax(axis=1), codec.BLANK).astype(np.uint8)
+
+    return SheetResult(student_id, codes)
+
+
+def _pdfium():
+    try:
+        import pypdfium2
+    except ImportError:
+        raise OMRError("Reading PDFs requires pypdfium2")
+    return pypdfium2
+
+
+def open_pdf(data):
+    pdfium = _pdfium()
+    try:
+        return pdfium.PdfDocument(data)
+    except pdfium.PdfiumError:
+        raise OMRError("Unreadable PDF")
+
+
+def render_page(pdf, page_number):
+    """Render one page of an open PDF into a greyscale array."""
+    pdfium = _pdfium()
+    try:
+        # Render at roughly 100 dpi, the layout's native scale
+        image = pdf[page_number].render(scale=100 / 72, grayscale=True).to_pil()
+    except pdfium.PdfiumError:
+        raise OMRError("Unreadable PDF page")
+    return np.asarray(image.convert("L"))
+
+
+def decode_image(data):
+    """Decode an uploaded image into a greyscale array."""
+    try:
+        from PIL import Image
+    except ImportError:
+        raise OMRError("Reading images requires Pillow")
+
+    try:
+        return np.asarray(Image.open(io.BytesIO(data)).convert("L"))
+    except (OSError, Image.DecompressionBombError):
+        raise OMRError("Unreadable image")
+
+
+def count_pages(data, content_type):
+    if content_type != "application/pdf":
+        return 1
+    return len(open_pdf(data))
+
+
+def _read_pages(job):
+    """Read a run of pages of one upload, opening the file only once."""
+    data, content_type, pages, questions = job
+    try:
+        if content_type == "application/pdf":
+            pdf = open_pdf(data)
+            decode = lambda page_number: render_page(pdf, page_number)
+        else:
+            decode = lambda page_number: decode_image(data)
+    except OMRError as e:
+        return [(None, str(e))] * len(pages)
+
+    results = []
+    for page_number in pages:
+        try:
+            result = read_sheet(decode(page_number), questions)
+        except OMRError as e:
+            results.append((None, str(e)))
+        else:
+            results.append(((result.student_id, codec.to_text(result.codes)), None))
+    return results
+
+
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.GRADER_OMR_WORKERS)
+    return _pool
+
+
+def read_uploads(uploads, questions):
+    """
+    Read every page of ``uploads`` (``(name, content_type, bytes)`` triples).
+
+    Returns ``(students, pages, errors)`` where ``students`` are records in
+    the shape ``save_students_answers`` accepts, ``pages`` has the file and
+    page each student was read from, and ``errors`` names unreadable pages.
+
+    A PDF is split into one run of pages per pool worker, so each worker
+    receives and parses the document once rather than once per page.
+    """
+    workers = max(1, settings.GRADER_OMR_WORKERS)
+    jobs, labels, errors = [], [], []
+    for name, content_type, data in uploads:
+        try:
+            pages = count_pages(data, content_type)
+        except OMRError as e:
+            errors.append({"file": name, "error": str(e)})
+            continue
+
+        run = -(-pages // workers)
+        for first in range(0, pages, run):
+            page_numbers = range(first, min(first + run, pages))
+            jobs.append((data, content_type, page_numbers, questions))
+            labels += [{"file": name, "page": number + 1} for number in page_numbers]
+
+    if len(jobs) > 1 and workers > 1:
+        results = _get_pool().map(_read_pages, jobs)
+    else:
+        results = map(_read_pages, jobs)
+
+    students, student_pages = [], []
+    for label, (read, error) in zip(labels, itertools.chain.from_iterable(results)):
+        if error:
+            errors.append({**label, "error": error})
+            continue
+
+        student_id, answers = read
+        students.append(
+            {"studentId": student_id, "studentName": None, "answers": answers}
+        )
+        student_pages.append(label)
+
+    return students, student_pages, errors
+
+
+def render_sheet(
+    student_id, answers, layout=DEFAULT_LAYOUT, scale=1.0, angle=0.0, noise=0, seed=0
+):
+    """
+    Draw a synthetic filled-in sheet as a greyscale array.
+
+    ``answers`` is a string of choices (blank for no mark). ``angle`` rotates
+    the page by that many degrees and ``noise`` adds Gaussian noise, for
+    testing and benchmarking the reader.
+    """
+    height, width = int(layout.height * scale), int(layout.width * scale)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+
+    # Sample the upright template at rotated coordinates
+    theta = np.deg2rad(angle)
+    cx, cy = width / 2, height / 2
+    tx = (np.cos(theta) * (x - cx) + np.sin(theta) * (y - cy) + cx) / scale
+    ty = (-np.sin(theta) * (x - cx) + np.cos(theta) * (y - cy) + cy) / scale
+
+    ink = np.zeros((height, width), dtype=bool)
+    half = layout.marker_size / 2
+    for mx, my in layout.markers():
+        ink |= (np.abs(tx - mx) <= half) & (np.abs(ty - my) <= half)
+
+    r = layout.bubble_radius
+    digits = str(student_id).zfill(layout.id_digits)
+    codes = codec.to_codes([answers], len(answers))[0]
+
+    centres = []
+    for position, digit in enumerate(digits):
+        for value, (bx, by) in enumerate(layout.id_bubbles()[position]):
+            centres.append((bx, by, value == int(digit)))
+    for question, row in enumerate(layout.answer_bubbles(len(answers))):
+        for choice, (bx, by) in enumerate(row):
+            centres.append((bx, by, bool(codes[question] & (1 << choice))))
+
+    for bx, by, filled in centres:
+        # Only touch the bubble's neighbourhood in the output
+        ux, uy = bx * scale - cx, by * scale - cy
+        px = np.cos(theta) * ux - np.sin(theta) * uy + cx
+        py = np.sin(theta) * ux + np.cos(theta) * uy + cy
+        pad = (r + 4) * scale * 1.5
+        ys = slice(max(int(py - pad), 0), min(int(py + pad), height))
+        xs = slice(max(int(px - pad), 0), min(int(px + pad), width))
+        distance = np.hypot(tx[ys, xs] - bx, ty[ys, xs] - by)
+        outline = np.abs(distance - r) <= 1
+        ink[ys, xs] |= outline | (filled & (distance <= r))
+
+    page = np.where(ink, 20, 235).astype(np.float32)
+    if noise:
+        page += np.random.default_rng(seed).normal(0, noise, page.shape)
+    return np.clip(page, 0, 255).astype(np.uint8)
@@ -0,0 +1,193 @@
+"""
+Answer-similarity screening for a course.
+
+Students who independently get a question wrong rarely pick the same wrong
+option every time, so many *identical wrong answers* shared by two students
+is the classic sign of copying. Each student's wrong answers are one-hot
+encoded, one column per wrong answer actually given to a question, and the
+pairwise counts come out of matrix products computed one block of rows at a
+time, so memory stays bounded however large the course is.
+
+Each pair is scored against what chance predicts: on a question both got
+wrong, two students match with probability ``p``, the chance that two wrong
+students picked the same option, taken from the course's own wrong-answer
+frequencies. The number of matches is then a sum of independent Bernoulli
+trials with mean ``sum(p)`` and variance ``sum(p * (1 - p))`` over the
+questions both got wrong, and pairs are ranked by their z-score. A high score
+is a reason to look at two scripts, not proof of anything.
+"""
+
+import math
+
+import numpy as np
+
+from . import codec
+from .models import Submission
+
+TOP_PAIRS = 50
+MAX_PAIRS = 1000
+# Pairs sharing fewer identical wrong answers are never reported
+MIN_SHARED = 3
+# Working memory per pair of a block: three float32 matrices (shared wrong
+# answers, z-scores and their spread), a partitioned copy and boolean masks
+BYTES_PER_PAIR = 20
+
+
+def rows_per_block(memory):
+    """Rows per block so that a block of pairs fits in ``memory`` bytes."""
+    return max(64, math.isqrt(memory // BYTES_PER_PAIR))
+
+
+def encode_wrong(key, matrix):
+    """
+    Returns ``(onehot, wrong, column_questions)``: a ``(students, wrong
+    answers)`` matrix with a 1 where a student gave that wrong answer, the
+    ``(students, questions)`` mask of wrong answers and the question of each
+    one-hot column. Blank answers are not wrong answers.
+    """
+    wrong = (matrix != key) & (matrix != codec.BLANK) & (key != codec.BLANK)
+
+    columns = [
+        (question, code)
+        for question in range(matrix.shape[1])
+        for code in np.unique(matrix[wrong[:, question], question])
+    ]
+    onehot = np.zeros((matrix.shape[0], len(columns)), dtype=np.float32)
+    for i, (question, code) in enumerate(columns):
+        onehot[:, i] = wrong[:, question] & (matrix[:, question] == code)
+
+    return onehot, wrong, np.array([q for q, _ in columns], dtype=np.int64)
+
+
+def match_probability(onehot, column_questions, questions):
+    """
+    Per question, the chance that two different students who both got it
+    wrong gave the same wrong answer.
+    """
+    counts = onehot.sum(axis=0, dtype=np.float64)
+    same = np.bincount(column_questions, counts * (counts - 1), minlength=questions)
+    wrong = np.bincount(column_questions, counts, minlength=questions)
+    pairs = wrong * (wrong - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(pairs > 0, same / pairs, 0.0)
+
+
+def similar_pairs(
+    key,
+    matrix,
+    top=TOP_PAIRS,
+    min_shared=MIN_SHARED,
+    block=1024,
+    progress=None,
+):
+    """
+    The ``top`` most suspicious pairs of rows of ``matrix``, most suspicious
+    first, as dicts of row indices and statistics. ``progress`` is called with
+    ``(done, total)`` row blocks.
+    """
+    students, questions = matrix.shape
+    onehot, wrong, column_questions = encode_wrong(key, matrix)
+    p = match_probability(onehot, column_questions, questions).astype(np.float32)
+    wrong = wrong.astype(np.float32)
+    weighted_mean = wrong * p
+    weighted_variance = wrong * (p * (1 - p))
+
+    best_z = np.empty(0, dtype=np.float32)
+    best_pairs = np.empty((0, 2), dtype=np.int64)
+    threshold = -np.inf  # the z-score a pair must beat to make the top
+    blocks = list(range(0, students, block))
+    # Every block's matrices are views of the same buffers
+    buffers = [np.empty(block * block, dtype=np.float32) for _ in range(3)]
+
+    for done, a in enumerate(blocks, 1):
+        rows = slice(a, a + block)
+        for c in range(a, students, block):
+            columns = slice(c, c + block)
+            shape = (len(onehot[rows]), len(onehot[columns]))
+            shared, z, spread = (
+                b[: shape[0] * shape[1]].reshape(shape) for b in buffers
+            )
+
+            np.matmul(onehot[rows], onehot[columns].T, out=shared)
+            np.matmul(weighted_mean[rows], wrong[columns].T, out=z)
+            np.subtract(shared, z, out=z)
+            np.matmul(weighted_variance[rows], wrong[columns].T, out=spread)
+            np.sqrt(spread, out=spread)
+            # Without spread every shared answer was the only wrong option
+            # anyone chose, so shared equals expected and z stays 0
+            np.divide(z, spread, out=z, where=spread > 0)
+
+            z[shared < min_shared] = -np.inf
+            if c == a:
+                # Each pair once, and never a student with themselves
+                z[np.tri(*shape, dtype=bool)] = -np.inf
+
+            flat = z.ravel()
+            if flat.size > top:
+                threshold = max(threshold, np.partition(flat, -top)[-top])
+            hits = np.flatnonzero((flat >= threshold) & (flat > -np.inf))
+            if not hits.size:
+                continue
+
+            best_z = np.concatenate([best_z, flat[hits]])
+            first, second = np.divmod(hits, shape[1])
+            best_pairs = np.concatenate(
+                [best_pairs, np.column_stack([first + a, second + c])]
+            )
+            if best_z.size > top:
+                keep = np.argpartition(-best_z, top - 1)[:top]
+                best_z, best_pairs = best_z[keep], best_pairs[keep]
+                threshold = max(threshold, best_z.min())
+
+        if progress is not None:
+            progress(done, len(blocks))
+
+    order = np.argsort(-best_z, kind="stable")
+    results = []
+    for z, (i, k) in zip(best_z[order].tolist(), best_pairs[order].tolist()):
+        both_wrong = wrong[i] * wrong[k]
+        results.append(
+            {
+                "first": i,
+                "second": k,
+                "sharedWrong": int(onehot[i] @ onehot[k]),
+                "bothWrong": int(both_wrong.sum()),
+                "expectedShared": float(both_wrong @ p),
+                "zScore": z,
+                # One-sided normal tail of the z-score
+                "pValue": 0.5 * math.erfc(z / math.sqrt(2)),
+            }
+        )
+    return results
+
+
+def course_similarity(course, top=TOP_PAIRS, min_shared=MIN_SHARED, **kwargs):
+    """Suspicious pairs of ``course`` submissions, identified by student."""
+    width = codec.length(course.keys)
+    rows = list(
+        Submission.objects.filter(associated_with=course)
+        .order_by("student_id")
+        .values_list("student_id", "student_name", "answers")
+        .iterator(chunk_size=5000)
+    )
+    matrix = codec.unpack([answers for _, _, answers in rows], width)
+    key = codec.unpack([course.keys], width)[0]
+
+    def student(index):
+        student_id, student_name, _ = rows[index]
+        return {"studentId": student_id, "studentName": student_name}
+
+    pairs = [
+        {
+            "first": student(pair.pop("first")),
+            "second": student(pair.pop("second")),
+            **pair,
+        }
+        for pair in similar_pairs(key, matrix, top, min_shared, **kwargs)
+    ]
+    return {
+        "courseCode": course.course_code,
+        "submissions": len(rows),
+        "minShared": min_shared,
+        "pairs": pairs,
+    }
@@ -1,3 +1,1410 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from importlib.util import find_spec
+from io import BytesIO, StringIO
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import activity, codec, jobs, metrics, omr, similarity
+from .analysis import item_statistics
+from .cache import ResponseCache, response_cache
+from .engine import InvalidScale, get_grade, get_scale, grade_batch, grade_student
+from .ingest import (
+    BULK_CHUNK_SIZE,
+    WriteQueue,
+    build_submissions,
+    copy_submissions,
+    save_submissions,
+)
+from .models import AnswerKey, CourseStats, Job, Setting, Submission, User
+from .urls import urlpatterns
+
+# Tests must not clear the cache of a server running from the same checkout
+TEST_CACHE_DIR = TemporaryDirectory()
+TEST_CACHES = {
+    "default": {"BACKEND": settings.FILE_CACHE, "LOCATION": TEST_CACHE_DIR.name}
+}
+
+
+class GradingEngineTests(TestCase):
+    def assertMatchesLoop(self, keys, answers, no_of_questions, *setting):
+        graded = grade_batch(keys, answers, no_of_questions, *setting)
+        for i, student_answers in enumerate(answers):
+            score, percentage, grade = grade_student(
+                keys, student_answers, no_of_questions, *setting
+            )
+            self.assertEqual(graded.scores[i], float(score))
+            self.assertEqual(graded.percentages[i], float(percentage))
+            self.assertEqual(graded.grades[i], grade)
+
+    def test_batch_matches_loop(self):
+        rng = random.Random(1)
+        keys = "".join(rng.choice("ABCD") for _ in range(40))
+        answers = [
+            "".join(rng.choice("ABCDabcd ") for _ in range(40)) for _ in range(500)
+        ]
+
+        self.assertMatchesLoop(keys, answers, 40)
+        self.assertMatchesLoop(keys, answers, 40, True, Decimal("0.25"))
+        self.assertMatchesLoop(keys, answers, 40, True, Decimal("0.33"))
+        self.assertMatchesLoop(keys, answers, 0, True, Decimal("1.00"))
+
+    def test_short_answers_count_as_wrong(self):
+        graded = grade_batch("ABCD", ["AB"], 4)
+        self.assertEqual(graded.scores, [2.0])
+        self.assertEqual(graded.grades, ["E"])
+
+    def test_multi_select_scoring(self):
+        answers = ["A[AC][ABD]", "AA[AB]", "AC[ABC]"]
+
+        exact = grade_batch("A[AC][ABD]", answers, 3)
+        self.assertEqual(exact.scores, [3.0, 1.0, 1.0])
+
+        partial = grade_batch("A[AC][ABD]", answers, 3, False, 0, None, True)
+        self.assertEqual(partial.scores, [3.0, 2.16, 1.83])
+        self.assertEqual(partial.percentages, [100.0, 72.0, 61.0])
+
+    def test_partial_credit_is_never_penalised(self):
+        graded = grade_batch(
+            "A[AC]B", ["A[CD]D", "AAD"], 3, True, Decimal("0.25"), None, True
+        )
+        self.assertEqual(graded.scores, [0.5, 1.25])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class GraderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        response_cache.clear()
+        self.user = User.objects.create_user("author@example.com", password="pw")
+        self.key = AnswerKey.objects.create(
+            author=self.user,
+            course_code="CS101",
+            course_name="Intro",
+            no_of_questions=4,
+            keys=codec.encode("ABCD"),
+            mark_per_question=1,
+            total_marks=4,
+        )
+        Setting.objects.create(answer_key=self.key)
+
+
+class GradingScaleTests(GraderTestCase):
+    CUSTOM = [
+        {"grade": "Distinction", "min": 75, "passing": True},
+        {"grade": "Pass", "min": 40, "passing": True},
+        {"grade": "Fail", "min": 0},
+    ]
+
+    def test_builtin_scales(self):
+        percentages = [100, 89.99, 50, 49.5, 0]
+        self.assertEqual(
+            get_scale("STD").grade(percentages), [get_grade(p) for p in percentages]
+        )
+        self.assertEqual(
+            get_scale("NUM").grade(percentages), ["100", "89", "50", "49", "0"]
+        )
+        self.assertIs(get_scale("NUM"), get_scale("NUM"))
+
+    def test_invalid_custom_scale(self):
+        for custom in [None, [{"grade": "A", "min": 50}], [{"grade": "A"}]]:
+            with self.assertRaises(InvalidScale):
+                get_scale("CUS", custom)
+
+    def test_custom_scale_grades_uploads(self):
+        self.key.grading_scale = "CUS"
+        self.key.grade_boundaries = self.CUSTOM
+        self.key.save()
+
+        save_submissions(
+            self.key, self.key.setting, [(1, "Ama", "ABCD"), (2, "Kofi", "ABAA")]
+        )
+
+        self.assertEqual(
+            list(
+                Submission.objects.order_by("student_id").values_list(
+                    "grade", flat=True
+                )
+            ),
+            ["Distinction", "Pass"],
+        )
+        self.assertEqual(self.key.stats.pass_count, 2)
+
+    def test_changing_scale_regrades(self):
+        save_submissions(
+            self.key, self.key.setting, [(1, "Ama", "ABCD"), (2, "Kofi", "ABAA")]
+        )
+        self.assertEqual(CourseStats.objects.get(answer_key=self.key).pass_count, 2)
+
+        custom = [{"grade": "P", "min": 60, "passing": True}, {"grade": "F", "min": 0}]
+        response = self.client.patch(
+            reverse("edit"),
+            {
+                "id": self.key.id,
+                "answerKey": "ABCD",
+                "courseCode": "CS101",
+                "courseName": "Intro",
+                "numQuestions": 4,
+                "negativeMarking": False,
+                "gradingScale": "CUS",
+                "customScale": custom,
+                "totalMarks": 4,
+                "author": self.user.username,
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(
+                Submission.objects.order_by("student_id").values_list(
+                    "grade", flat=True
+                )
+            ),
+            ["P", "F"],
+        )
+        self.assertEqual(CourseStats.objects.get(answer_key=self.key).pass_count, 1)
+
+
+class SaveStudentsAnswersTests(GraderTestCase):
+    def post(self, students):
+        return self.client.post(
+            reverse("saveStudentsAnswers"),
+            {"students": students, "course_code": "CS101"},
+            content_type="application/json",
+        )
+
+    def test_saves_batch(self):
+        response = self.post(
+            [
+                {"studentId": 1, "studentName": "Ama", "answers": "ABCD"},
+                {"studentId": 2, "studentName": "Kofi", "answers": "ABCA"},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["saved"], 2)
+        self.assertEqual(
+            list(Submission.objects.order_by("student_id").values_list("grade")),
+            [("A",), ("C",)],
+        )
+
+    def test_invalid_row_rejects_batch(self):
+        response = self.post(
+            [
+                {"studentId": 1, "studentName": "Ama", "answers": "ABCD"},
+                {"studentId": 2, "studentName": "Kofi", "answers": "AB"},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0]["row"], 1)
+        self.assertFalse(Submission.objects.exists())
+
+    def test_student_ids_beyond_32_bits(self):
+        response = self.post(
+            [{"studentId": 4211231199, "studentName": "Ama", "answers": "ABCD"}]
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Submission.objects.filter(student_id=4211231199).exists())
+
+    def test_multi_select_partial_credit(self):
+        AnswerKey.objects.filter(pk=self.key.pk).update(keys=codec.encode("AB[AC][BD]"))
+        Setting.objects.filter(answer_key=self.key).update(partial_credit=True)
+
+        response = self.post(
+            [
+                {"studentId": 1, "studentName": "Ama", "answers": "AB[AC]B"},
+                {"studentId": 2, "studentName": "Kofi", "answers": "ABAB"},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(
+                Submission.objects.order_by("student_id").values_list("score", "grade")
+            ),
+            [(3.5, "B"), (3.0, "C")],
+        )
+        course = self.client.get(
+            reverse("course_submissions", args=["CS101"]), {"id": self.user.username}
+        ).json()
+        self.assertEqual(course["correctAnswers"], ["A", "B", "AC", "BD"])
+        answers = {row["studentId"]: row["answers"] for row in course["submissions"]}
+        self.assertEqual(answers[1], ["A", "B", "AC", "B"])
+
+    def test_reupload_replaces_submissions(self):
+        self.post(
+            [
+                {"studentId": 1, "studentName": "Ama", "answers": "ABCD"},
+                {"studentId": 2, "studentName": "Kofi", "answers": "ABCA"},
+            ]
+        )
+        created = Submission.objects.get(student_id=1).created_at
+
+        response = self.post(
+            [
+                {"studentId": 1, "studentName": "Ama", "answers": "AAAA"},
+                {"studentId": 3, "studentName": "Esi", "answers": "ABCD"},
+                {"studentId": 3, "studentName": "Esi", "answers": "ABCA"},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(
+                Submission.objects.order_by("student_id").values_list(
+                    "student_id", "grade"
+                )
+            ),
+            [(1, "F"), (2, "C"), (3, "C")],
+        )
+        self.assertEqual(Submission.objects.get(student_id=1).created_at, created)
+        stats = CourseStats.objects.get(answer_key=self.key)
+        self.assertEqual((stats.submission_count, stats.score_sum), (3, 7.0))
+
+    @skipUnless(connection.vendor == "postgresql", "COPY needs PostgreSQL")
+    def test_copy_upserts(self):
+        save_submissions(self.key, self.key.setting, [(1, "Ama", "ABCD")])
+        copy_submissions(
+            build_submissions(
+                self.key, self.key.setting, [(1, "Ama", "AAAA"), (2, None, "AB C")]
+            )
+        )
+
+        self.assertEqual(
+            list(
+                Submission.objects.order_by("student_id").values_list(
+                    "student_id", "student_name", "score", "grade"
+                )
+            ),
+            [(1, "Ama", 1.0, "F"), (2, None, 2.0, "E")],
+        )
+        self.assertFalse(Submission.objects.filter(created_at__isnull=True).exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class WriteQueueTests(TransactionTestCase):
+    def test_merges_waiting_batches(self):
+        user = User.objects.create_user("author@example.com", password="pw")
+        key = AnswerKey.objects.create(
+            author=user,
+            course_code="CS101",
+            course_name="Intro",
+            no_of_questions=4,
+            keys=codec.encode("ABCD"),
+            mark_per_question=1,
+            total_marks=4,
+        )
+        queue = WriteQueue(max_rows=100)
+        # Hold the writer role so that every submission below has to wait
+        queue._writing = True
+
+        def submit(student_id):
+            queue.submit(
+                key, build_submissions(key, Setting(), [(student_id, None, "ABCD")])
+            )
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        while queue.stats()["pending"] < 3:
+            time.sleep(0.001)
+        queue._write_group()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(queue.stats(), {"batches": 3, "transactions": 1, "pending": 0})
+        self.assertEqual(Submission.objects.count(), 3)
+        self.assertEqual(CourseStats.objects.get().submission_count, 3)
+
+    @override_settings(GRADER_WRITE_QUEUE=True)
+    def test_parallel_uploads(self):
+        output = StringIO()
+        call_command(
+            "stress_uploads",
+            threads=4,
+            uploads=3,
+            rows=20,
+            questions=10,
+            json=True,
+            stdout=output,
+        )
+
+        report = json.loads(output.getvalue())
+        self.assertEqual(report["failed"], 0)
+        self.assertEqual(report["stored"], 4 * 3 * 20)
+        self.assertLessEqual(report["transactions"], 12)
+
+
+class StreamStudentsAnswersTests(GraderTestCase):
+    def stream(self, body, content_type):
+        return self.client.post(
+            reverse("streamStudentsAnswers") + "?course_code=CS101",
+            body,
+            content_type=content_type,
+        )
+
+    def test_ndjson_upload(self):
+        body = "\n".join(
+            [
+                '{"studentId": 1, "studentName": "Ama", "answers": "ABCD"}',
+                "not json",
+                '{"studentId": 2, "studentName": "Kofi", "answers": "ABCA"}',
+            ]
+        )
+        response = self.stream(body, "application/x-ndjson")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["saved"], 2)
+        self.assertEqual(response.json()["rejected"], 1)
+        self.assertEqual(response.json()["errors"][0]["row"], 1)
+
+    def test_csv_upload(self):
+        body = "studentId,studentName,answers\n1,Ama,ABCD\n2,Kofi,DCBA\n"
+        response = self.stream(body, "text/csv")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Submission.objects.count(), 2)
+
+    def test_failure_after_a_committed_chunk_invalidates(self):
+        etag = self.client.get(reverse("courses"), {"id": self.user.username})["ETag"]
+
+        # The row after the first chunk overflows the csv module's field limit
+        rows = [f"{i},Student,ABCD" for i in range(BULK_CHUNK_SIZE)]
+        body = "\n".join(
+            ["studentId,studentName,answers", *rows, "0,Bad," + "A" * 2**18]
+        )
+        with self.assertRaises(csv.Error):
+            self.stream(body, "text/csv")
+
+        response = self.client.get(
+            reverse("courses"), {"id": self.user.username}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["totalSubmissions"], BULK_CHUNK_SIZE)
+
+
+class CourseStatsTests(GraderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.post(
+            reverse("saveStudentsAnswers"),
+            {
+                "students": [
+                    {"studentId": 1, "studentName": "Ama", "answers": "ABCD"},
+                    {"studentId": 2, "studentName": "Kofi", "answers": "AAAA"},
+                ],
+                "course_code": "CS101",
+            },
+            content_type="application/json",
+        )
+
+    def test_stats_follow_inserts_and_deletes(self):
+        stats = CourseStats.objects.get(answer_key=self.key)
+        self.assertEqual(stats.submission_count, 2)
+        self.assertEqual(stats.score_sum, 5.0)
+        self.assertEqual(stats.pass_count, 1)
+        self.assertEqual(stats.max_score, 4.0)
+
+        Submission.objects.get(student_id=1).delete()
+        stats.refresh_from_db()
+        self.assertEqual(stats.submission_count, 1)
+        self.assertEqual(stats.max_score, 1.0)
+
+    def test_rebuild_matches_incremental(self):
+        before = CourseStats.objects.values().get(answer_key=self.key)
+        call_command("rebuild_course_stats", stdout=StringIO())
+        after = CourseStats.objects.values().get(answer_key=self.key)
+
+        before.pop("id")
+        after.pop("id")
+        self.assertEqual(before, after)
+
+    def test_courses_endpoint_reads_stats(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("courses"), {"id": self.user.username})
+
+        self.assertEqual(response.json()["courseList"][0]["averageScore"], "62.50")
+        self.assertEqual(response.json()["totalSubmissions"], 2)
+
+
+class CourseSubmissionPageTests(GraderTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(7):
+            Submission.objects.create(
+                student_id=i,
+                student_name=f"Student {i}",
+                associated_with=self.key,
+                answers=codec.encode("ABCD"),
+                score=i % 5,
+                grade="A" if i % 2 else "F",
+            )
+
+    def page(self, **params):
+        response = self.client.get(
+            reverse("course_submission_page", args=["cs101"]),
+            {"id": self.user.username, **params},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_walks_every_row_once(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 3, "sort": "score"}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.page(**params)
+            seen += [(s["score"], s["id"]) for s in data["submissions"]]
+            cursor = data["nextCursor"]
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_tampered_cursors_are_rejected(self):
+        for sort, cursor in [
+            ("score", ["x", 1]),
+            ("score", [{"a": 1}, 1]),
+            ("score", [1.5, "1"]),
+            ("studentId", [1.5, 1]),
+            ("studentId", [2**64, 1]),
+            ("updatedAt", [1, 1]),
+        ]:
+            encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+            response = self.client.get(
+                reverse("course_submission_page", args=["cs101"]),
+                {"id": self.user.username, "sort": sort, "cursor": encoded},
+            )
+            self.assertEqual(response.status_code, 400, cursor)
+
+    def test_filters(self):
+        data = self.page(grade="a", minScore=2)
+        self.assertEqual(sorted(s["studentId"] for s in data["submissions"]), [3])
+
+        data = self.page(student="Student 5")
+        self.assertEqual([s["studentId"] for s in data["submissions"]], [5])
+
+    def test_summary(self):
+        response = self.client.get(
+            reverse("course_summary", args=["cs101"]), {"id": self.user.username}
+        )
+        self.assertEqual(response.json()["totalSubmissions"], 7)
+
+
+class CodecTests(TestCase):
+    def test_round_trip(self):
+        for text in ["", "A", "ABCD", "abcdA", "AB D"]:
+            packed = codec.encode(text)
+            self.assertEqual(codec.length(packed), len(text))
+            self.assertEqual(codec.decode(packed), text.upper())
+
+        self.assertEqual(len(codec.encode("ABCD" * 10)), 22)
+
+    def test_invalid_choices_are_blank(self):
+        self.assertEqual(codec.decode(codec.encode("AxE?")), "A   ")
+
+    def test_multi_select_round_trip(self):
+        packed = codec.encode("a[ac] [ABCD]")
+        self.assertEqual(codec.length(packed), 4)
+        self.assertEqual(codec.decode(packed), "A[AC] [ABCD]")
+        self.assertEqual(codec.decode_list(packed), ["A", "AC", " ", "ABCD"])
+
+    def test_is_valid(self):
+        for text in ["ABCD", "a[bc]D", "[ABCD]"]:
+            self.assertTrue(codec.is_valid(text), text)
+        for text in ["", "AE", "A[]", "A[E]", "A[B", "A B"]:
+            self.assertFalse(codec.is_valid(text), text)
+
+    def test_unpack_matches_to_codes(self):
+        answers = ["ABCDA", "DCBA ", "AAAAA"]
+        packed = codec.pack_codes(codec.to_codes(answers, 5))
+        self.assertTrue((codec.unpack(packed, 5) == codec.to_codes(answers, 5)).all())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ItemAnalysisTests(TestCase):
+    def test_statistics(self):
+        key = codec.to_codes(["AB"], 2)[0]
+        matrix = codec.to_codes(["AB", "AC", "CB", "C "], 2)
+        stats = item_statistics(key, matrix)
+
+        self.assertEqual(stats["difficulty"], [0.5, 0.5])
+        self.assertEqual(stats["options"]["C"], [2, 1])
+        self.assertEqual(stats["options"]["blank"], [0, 1])
+        self.assertGreater(stats["discrimination"][0], 0)
+        self.assertAlmostEqual(stats["pointBiserial"][0], 0.7071, places=3)
+
+
+class ItemAnalysisEndpointTests(GraderTestCase):
+    def test_cached_until_submissions_change(self):
+        url = reverse("course_item_analysis", args=["CS101"])
+        params = {"id": self.user.username}
+        save_submissions(self.key, self.key.setting, [(1, "Ama", "ABCD")])
+
+        self.assertEqual(self.client.get(url, params).json()["totalSubmissions"], 1)
+        with self.assertNumQueries(1):
+            self.client.get(url, params)
+
+        save_submissions(self.key, self.key.setting, [(2, "Kofi", "DCBA")])
+        self.assertEqual(self.client.get(url, params).json()["totalSubmissions"], 2)
+
+
+class DistributionTests(GraderTestCase):
+    def test_matches_numpy(self):
+        answers = ["ABCD", "ABCA", "ABAA", "AAAA", "DCBA", "ABCD", "BBCD"]
+        save_submissions(
+            self.key,
+            self.key.setting,
+            [(i, f"S{i}", a) for i, a in enumerate(answers)],
+        )
+        percentages = np.array(
+            Submission.objects.values_list("percentage", flat=True), dtype=float
+        )
+
+        data = self.client.get(
+            reverse("course_distribution", args=["CS101"]), {"id": self.user.username}
+        ).json()
+
+        self.assertEqual(data["count"], 7)
+        self.assertAlmostEqual(data["mean"], percentages.mean())
+        self.assertAlmostEqual(data["stdDev"], percentages.std())
+        for name, q in [("q1", 25), ("median", 50), ("q3", 75)]:
+            self.assertAlmostEqual(data[name], np.percentile(percentages, q))
+        self.assertEqual(data["histogram"][9]["count"], 2)  # 100% is in the last
+        self.assertEqual(sum(b["count"] for b in data["histogram"]), 7)
+        self.assertEqual(sum(data["grades"].values()), 7)
+
+    def test_author_distribution(self):
+        other = AnswerKey.objects.create(
+            author=self.user,
+            course_code="CS102",
+            course_name="Other",
+            no_of_questions=2,
+            keys=codec.encode("AB"),
+            mark_per_question=1,
+            total_marks=2,
+        )
+        Setting.objects.create(answer_key=other)
+        save_submissions(self.key, self.key.setting, [(1, "Ama", "ABCD")])
+        save_submissions(other, other.setting, [(1, "Ama", "BB"), (2, "Kofi", "AB")])
+
+        data = self.client.get(
+            reverse("distribution"), {"id": self.user.username}
+        ).json()
+
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(data["median"], 100)
+        self.assertEqual(
+            [(c["courseCode"], c["count"]) for c in data["courses"]],
+            [("CS101", 1), ("CS102", 2)],
+        )
+
+    def test_empty_course(self):
+        data = self.client.get(
+            reverse("course_distribution", args=["CS101"]), {"id": self.user.username}
+        ).json()
+
+        self.assertEqual(data["count"], 0)
+        self.assertIsNone(data["median"])
+
+
+class ActivityTests(GraderTestCase):
+    def setUp(self):
+        super().setUp()
+        save_submissions(
+            self.key,
+            self.key.setting,
+            [(1, "Ama", "ABCD"), (2, "Kofi", "ABCA"), (3, "Esi", "AAAA")],
+        )
+        save_submissions(self.key, self.key.setting, [(4, "Yaw", "DCBA")])
+        self.today = timezone.localdate()
+        for student_id, days in [(3, 2), (4, 10)]:
+            Submission.objects.filter(student_id=student_id).update(
+                updated_at=timezone.now() - timedelta(days=days)
+            )
+
+    def get(self, period="day"):
+        response_cache.clear()
+        response = self.client.get(
+            reverse("activity"), {"id": self.user.username, "period": period}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_buckets(self):
+        days = self.get()["buckets"]
+        self.assertEqual(
+            [(b["start"], b["submissions"]) for b in days],
+            [
+                (str(self.today - timedelta(days=10)), 1),
+                (str(self.today - timedelta(days=2)), 1),
+                (str(self.today), 2),
+            ],
+        )
+        self.assertEqual(days[-1]["averageScore"], 3.5)
+        self.assertEqual(days[-1]["averagePercentage"], 87.5)
+
+        weeks = self.get("week")
+        self.assertEqual(sum(b["submissions"] for b in weeks["buckets"]), 4)
+        self.assertEqual(
+            weeks["buckets"][-1]["start"], str(activity.open_bucket("week"))
+        )
+        self.assertEqual(weeks["courses"][0]["courseCode"], "CS101")
+
+    def test_invalid_period(self):
+        response = self.client.get(
+            reverse("activity"), {"id": self.user.username, "period": "year"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_the_open_bucket_is_recomputed(self):
+        self.get()
+        save_submissions(self.key, self.key.setting, [(5, "Abena", "ABCD")])
+
+        with self.assertNumQueries(1):
+            days = self.get()["buckets"]
+        self.assertEqual([b["submissions"] for b in days], [1, 1, 3])
+
+    def test_writes_into_closed_buckets_rebuild_them(self):
+        self.get()
+
+        Submission.objects.get(student_id=4).delete()
+        self.assertEqual([b["submissions"] for b in self.get()["buckets"]], [1, 2])
+
+        # A re-upload moves Esi's submission from two days ago to today
+        with self.captureOnCommitCallbacks(execute=True):
+            save_submissions(self.key, self.key.setting, [(3, "Esi", "ABCD")])
+        self.assertEqual([b["submissions"] for b in self.get()["buckets"]], [3])
+
+
+class TranscriptTests(GraderTestCase):
+    def test_transcript(self):
+        other = AnswerKey.objects.create(
+            author=self.user,
+            course_code="CS102",
+            course_name="Other",
+            no_of_questions=2,
+            keys=codec.encode("AB"),
+            mark_per_question=1,
+            total_marks=2,
+            grading_scale="NUM",
+        )
+        Setting.objects.create(answer_key=other)
+        save_submissions(self.key, self.key.setting, [(7, "Ama", "ABCA")])
+        save_submissions(other, other.setting, [(7, "Ama", "AA"), (8, "Kofi", "AB")])
+
+        data = self.client.get(
+            reverse("student_transcript", args=[7]), {"id": self.user.username}
+        ).json()
+
+        self.assertEqual(data["studentName"], "Ama")
+        self.assertEqual(
+            [(c["courseCode"], c["grade"], c["passed"]) for c in data["courses"]],
+            [("CS101", "C", True), ("CS102", "50", True)],
+        )
+        # C is the third of five passing grades; 50 the lowest of 51
+        points = [3.0, 5 / 51]
+        for course, expected in zip(data["courses"], points):
+            self.assertAlmostEqual(course["gradePoints"], expected)
+        summary = data["summary"]
+        self.assertEqual((summary["courses"], summary["passed"]), (2, 2))
+        self.assertAlmostEqual(summary["meanPercentage"], 62.5)
+        self.assertAlmostEqual(summary["overallPercentage"], 4 / 6 * 100)
+        self.assertAlmostEqual(summary["gpa"], sum(points) / 2)
+
+    def test_marks_per_question(self):
+        other = AnswerKey.objects.create(
+            author=self.user,
+            course_code="CS102",
+            course_name="Other",
+            no_of_questions=2,
+            keys=codec.encode("AB"),
+            mark_per_question=3,
+            total_marks=6,
+        )
+        Setting.objects.create(answer_key=other)
+        save_submissions(self.key, self.key.setting, [(7, "Ama", "ABCA")])
+        save_submissions(other, other.setting, [(7, "Ama", "AB")])
+
+        data = self.client.get(
+            reverse("student_transcript", args=[7]), {"id": self.user.username}
+        ).json()
+
+        self.assertEqual(
+            [(c["score"], c["marks"], c["totalMarks"]) for c in data["courses"]],
+            [(3.0, 3.0, 4), (2.0, 6.0, 6)],
+        )
+        # 3 of 4 marks and 6 of 6
+        self.assertAlmostEqual(data["summary"]["overallPercentage"], 9 / 10 * 100)
+
+    def test_unknown_student(self):
+        response = self.client.get(
+            reverse("student_transcript", args=[7]), {"id": "someone@example.com"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ResponseCacheTests(GraderTestCase):
+    def get_courses(self):
+        return self.client.get(reverse("courses"), {"id": self.user.username})
+
+    def test_served_from_cache_until_upload(self):
+        self.get_courses()
+        with self.assertNumQueries(0):
+            self.get_courses()
+
+        self.client.post(
+            reverse("saveStudentsAnswers"),
+            {
+                "students": [{"studentId": 1, "studentName": "A", "answers": "ABCD"}],
+                "course_code": "CS101",
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(self.get_courses().json()["totalSubmissions"], 1)
+        self.assertEqual(response_cache.stats()["hits"], 1)
+        self.assertEqual(response_cache.stats()["misses"], 2)
+
+    def test_invalidated_by_other_processes(self):
+        etag = self.get_courses()["ETag"]
+
+        # As grader_worker does after saving a queued upload
+        bump = (
+            "from grader.cache import response_cache; "
+            f"response_cache.bump({self.user.username!r})"
+        )
+        subprocess.run(
+            [sys.executable, "manage.py", "shell", "-c", bump],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                "CACHE_BACKEND": settings.FILE_CACHE,
+                "CACHE_LOCATION": TEST_CACHE_DIR.name,
+            },
+            check=True,
+        )
+
+        response = self.client.get(
+            reverse("courses"), {"id": self.user.username}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_invalidated_by_model_writes_and_rebuilds(self):
+        def revalidate(etag):
+            return self.client.get(
+                reverse("courses"), {"id": self.user.username}, HTTP_IF_NONE_MATCH=etag
+            )
+
+        etag = self.get_courses()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            submission = Submission.objects.create(
+                student_id=1,
+                associated_with=self.key,
+                answers=codec.encode("ABCD"),
+                score=4,
+                percentage=100,
+                grade="A",
+            )
+        response = revalidate(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["totalSubmissions"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.delete()
+        self.assertEqual(revalidate(response["ETag"]).json()["totalSubmissions"], 0)
+
+        etag = self.get_courses()["ETag"]
+        call_command("rebuild_course_stats", stdout=StringIO())
+        self.assertEqual(revalidate(etag).status_code, 200)
+
+    def test_lru_eviction(self):
+        lru = ResponseCache(max_entries=2)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("a"), 1)
+        self.assertEqual(lru.stats()["evictions"], 1)
+
+
+class AsyncReadViewTests(GraderTestCase):
+    async def test_served_through_asgi(self):
+        await sync_to_async(save_submissions)(
+            self.key, self.key.setting, [(1, "Ama", "ABCD"), (2, "Kofi", "ABCA")]
+        )
+        params = {"id": self.user.username}
+
+        course = await self.async_client.get(
+            reverse("course_submissions", args=["cs101"]), params
+        )
+        courses = await self.async_client.get(reverse("courses"), params)
+        keys = await self.async_client.get(reverse("keys", args=[self.user.username]))
+
+        self.assertEqual(course.status_code, 200)
+        self.assertEqual(len(course.json()["submissions"]), 2)
+        self.assertEqual(course.json()["correctAnswers"], list("ABCD"))
+        self.assertEqual(courses.json()["totalSubmissions"], 2)
+        self.assertEqual(keys.json()[0]["courseCode"], "CS101")
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "grader_cache",
+            }
+        }
+    )
+    async def test_database_cache_backend(self):
+        await sync_to_async(call_command)("createcachetable", verbosity=0)
+        url = reverse("courses")
+        params = {"id": self.user.username}
+
+        response = await self.async_client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+
+        revalidated = await self.async_client.get(
+            url, params, headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+        missing = await self.async_client.get(
+            reverse("course_submissions", args=["NOPE"]), params
+        )
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_revalidation(self):
+        url = reverse("courses")
+        response = await self.async_client.get(url, {"id": self.user.username})
+
+        again = await self.async_client.get(
+            url, {"id": self.user.username}, headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(again.status_code, 304)
+
+    def test_only_get(self):
+        response = self.client.post(reverse("courses"), {"id": self.user.username})
+        self.assertEqual(response.status_code, 405)
+
+
+class ConditionalRequestTests(GraderTestCase):
+    def test_not_modified_without_queries(self):
+        url = reverse("course_submissions", args=["CS101"])
+        save_submissions(self.key, self.key.setting, [(1, "Ama", "ABCD")])
+        response = self.client.get(url, {"id": self.user.username})
+        etag = response["ETag"]
+
+        response_cache.clear()  # force the 304 to come from the ETag alone
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, {"id": self.user.username}, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+        response_cache.bump(self.user.username, "CS101")
+        response = self.client.get(
+            url, {"id": self.user.username}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class OMRTests(GraderTestCase):
+    def test_reads_rotated_noisy_sheet(self):
+        answers = "ABCD DCBAABCDDCBAABCD"
+        page = omr.render_sheet(20240001, answers, angle=2.5, noise=25, scale=1.3)
+        result = omr.read_sheet(page, len(answers))
+
+        self.assertEqual(result.student_id, 20240001)
+        self.assertEqual(codec.to_text(result.codes), answers)
+
+    def test_blank_page_is_rejected(self):
+        with self.assertRaises(omr.OMRError):
+            omr.read_sheet(np.full((1100, 850), 235, dtype=np.uint8), 4)
+
+    @skipUnless(find_spec("PIL"), "Pillow is not installed")
+    def test_upload_endpoint(self):
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.fromarray(omr.render_sheet(42, "ABCA")).save(buffer, format="PNG")
+        sheet = SimpleUploadedFile("sheet.png", buffer.getvalue(), "image/png")
+
+        with self.settings(GRADER_OMR_WORKERS=1):
+            response = self.client.post(
+                reverse("uploadSheets"), {"course_code": "CS101", "sheets": [sheet]}
+            )
+
+        self.assertEqual(response.status_code, 201)
+        submission = Submission.objects.get()
+        self.assertEqual(submission.student_id, 42)
+        self.assertEqual(submission.grade, "C")
+
+    @skipUnless(find_spec("PIL"), "Pillow is not installed")
+    def test_bad_pages_are_reported_per_file(self):
+        from PIL import Image
+
+        sheet, tiny = BytesIO(), BytesIO()
+        Image.fromarray(omr.render_sheet(42, "ABCA")).save(sheet, format="PNG")
+        Image.new("L", (10, 10), 255).save(tiny, format="PNG")
+        uploads = [
+            ("sheet.png", "image/png", sheet.getvalue()),
+            ("tiny.png", "image/png", tiny.getvalue()),
+            ("corrupt.png", "image/png", b"\x89PNG not really"),
+        ]
+
+        with self.settings(GRADER_OMR_WORKERS=1):
+            students, pages, errors = omr.read_uploads(uploads, 4)
+
+        self.assertEqual([s["studentId"] for s in students], [42])
+        self.assertEqual(pages, [{"file": "sheet.png", "page": 1}])
+        self.assertEqual(
+            [(e["file"], e["error"]) for e in errors],
+            [
+                ("tiny.png", "Page is too small to locate the corner markers"),
+                ("corrupt.png", "Unreadable image"),
+            ],
+        )
+
+
+class JobTests(GraderTestCase):
+    def test_async_upload_runs_in_worker(self):
+        response = self.client.post(
+            reverse("saveStudentsAnswers") + "?async=1",
+            {
+                "students": [
+                    {"studentId": 1, "studentName": "Ama", "answers": "ABCD"},
+                    {"studentId": 2, "studentName": "Kofi", "answers": "ABCA"},
+                ],
+                "course_code": "CS101",
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Submission.objects.exists())
+
+        call_command("grader_worker", once=True, concurrency=1, stdout=StringIO())
+
+        job = self.client.get(reverse("job", args=[response.json()["jobId"]])).json()
+        self.assertEqual(job["state"], Job.SUCCEEDED)
+        self.assertEqual(job["progress"], 2)
+        self.assertEqual(job["result"], {"saved": 2})
+        self.assertEqual(Submission.objects.count(), 2)
+
+    def test_failed_batch_saves_nothing(self):
+        # The last row fails to grade after a full chunk has been graded
+        rows = [[i, "Student", "ABCD"] for i in range(BULK_CHUNK_SIZE)]
+        job = jobs.run(
+            jobs.enqueue(
+                "grade_batch",
+                {"answer_key_id": self.key.id, "rows": rows + [[0, "Bad", None]]},
+            )
+        )
+
+        self.assertEqual(job.state, Job.FAILED)
+        self.assertEqual(job.progress, BULK_CHUNK_SIZE)
+        self.assertFalse(Submission.objects.exists())
+
+    def test_claim_is_exclusive(self):
+        job = jobs.enqueue("grade_batch", {}, total=0)
+
+        self.assertEqual(jobs.claim("a").id, job.id)
+        self.assertIsNone(jobs.claim("b"))
+
+    def test_failure_is_recorded(self):
+        job = jobs.run(jobs.enqueue("grade_batch", {"answer_key_id": 0}))
+
+        self.assertEqual(job.state, Job.FAILED)
+        self.assertIn("DoesNotExist", job.error)
+
+    @override_settings(GRADER_JOB_LEASE=60, GRADER_JOB_MAX_ATTEMPTS=2)
+    def test_abandoned_jobs_are_reclaimed(self):
+        job = jobs.enqueue("grade_batch", {}, total=0)
+        self.assertEqual(jobs.claim("a").attempts, 1)
+        self.assertIsNone(jobs.claim("b"))
+
+        expired = timezone.now() - timedelta(seconds=61)
+        Job.objects.filter(pk=job.pk).update(updated_at=expired)
+        reclaimed = jobs.claim("b")
+        self.assertEqual((reclaimed.id, reclaimed.worker), (job.id, "b"))
+        self.assertEqual(reclaimed.attempts, 2)
+
+        # The first worker no longer owns the job, so its outcome is dropped
+        job.attempts = 1
+        jobs.report_progress(job, 5)
+        self.assertEqual(Job.objects.get(pk=job.pk).progress, 0)
+
+        Job.objects.filter(pk=job.pk).update(updated_at=expired)
+        self.assertIsNone(jobs.claim("c"))
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.FAILED)
+        self.assertIn("after 2 attempts", job.error)
+
+
+class SimilarityTests(GraderTestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        key = (1 << rng.integers(0, 4, 12)).astype(np.uint8)
+        matrix = (1 << rng.integers(0, 4, (40, 12))).astype(np.uint8)
+        matrix[rng.random(matrix.shape) < 0.1] = codec.BLANK
+        matrix[7] = matrix[3]
+
+        wrong = (matrix != key) & (matrix != codec.BLANK)
+        shared = {
+            (i, k): int((wrong[i] & (matrix[i] == matrix[k])).sum())
+            for i in range(40)
+            for k in range(i + 1, 40)
+        }
+
+        for block in [5, 16, 64]:
+            pairs = similarity.similar_pairs(key, matrix, top=10, block=block)
+            self.assertEqual((pairs[0]["first"], pairs[0]["second"]), (3, 7))
+            self.assertEqual(len(pairs), 10)
+            z = [pair["zScore"] for pair in pairs]
+            self.assertEqual(z, sorted(z, reverse=True))
+            for pair in pairs:
+                self.assertEqual(
+                    pair["sharedWrong"], shared[pair["first"], pair["second"]]
+                )
+
+    def test_runs_as_job(self):
+        save_submissions(
+            self.key,
+            self.key.setting,
+            [(1, "Ama", "BACA"), (2, "Kofi", "BACA"), (3, "Esi", "ABCD")],
+        )
+
+        response = self.client.post(
+            reverse("course_similarity", args=["CS101"]) + f"?id={self.user.username}",
+            {"minShared": 2},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 202)
+        call_command("grader_worker", once=True, concurrency=1, stdout=StringIO())
+
+        job = self.client.get(reverse("job", args=[response.json()["jobId"]])).json()
+        self.assertEqual(job["state"], Job.SUCCEEDED)
+        [pair] = job["result"]["pairs"]
+        self.assertEqual(
+            (pair["first"]["studentId"], pair["second"]["studentId"]), (1, 2)
+        )
+        self.assertEqual(pair["sharedWrong"], 3)
+
+    def test_rejects_bad_options(self):
+        response = self.client.post(
+            reverse("course_similarity", args=["CS101"]) + f"?id={self.user.username}",
+            {"top": 0},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(GraderTestCase):
+    def test_csv_has_correctness_columns(self):
+        save_submissions(
+            self.key, self.key.setting, [(2, "Kofi", "ABCA"), (1, "Ama", "ABCD")]
+        )
+        response = self.client.get(
+            reverse("course_export", args=["CS101"]), {"id": self.user.username}
+        )
+        rows = list(
+            csv.reader(b"".join(response.streaming_content).decode().splitlines())
+        )
+
+        self.assertEqual(rows[0][-4:], ["Q1", "Q2", "Q3", "Q4"])
+        self.assertEqual(rows[1][0], "1")
+        self.assertEqual(rows[2][-4:], ["1", "1", "1", "0"])
+
+
+class QueryBudgetTests(GraderTestCase):
+    """Every endpoint runs a fixed number of queries, however much data exists."""
+
+    SIZES = [(1, 2), (4, 30)]
+
+    def setUp(self):
+        super().setUp()
+        self.courses = 0
+        self.students = 0
+
+    def seed(self, courses, students):
+        keys = [self.key]
+        for _ in range(courses):
+            self.courses += 1
+            key = AnswerKey.objects.create(
+                author=self.user,
+                course_code=f"Q{self.courses}",
+                course_name="Seeded",
+                no_of_questions=4,
+                keys=codec.encode("ABCD"),
+                mark_per_question=1,
+                total_marks=4,
+            )
+            Setting.objects.create(answer_key=key)
+            keys.append(key)
+
+        for key in keys:
+            rows = [
+                (self.students + i, f"S{i}", random.choice(["ABCD", "ABCA", "DCBA"]))
+                for i in range(students)
+            ]
+            save_submissions(key, key.setting, rows)
+        self.students += students
+        return keys
+
+    def assertBudget(self, budget, request):
+        for courses, students in self.SIZES:
+            keys = self.seed(courses, students)
+            cache.clear()
+            response_cache.clear()
+
+            with self.assertNumQueries(budget):
+                response = request(keys)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+
+            self.assertLess(response.status_code, 300)
+
+    def get(self, name, *args):
+        url = reverse(name, args=args)
+        return lambda keys: self.client.get(url, {"id": self.user.username})
+
+    def test_read_endpoints(self):
+        for budget, name, args in [
+            (1, "courses", []),
+            (2, "course_submissions", ["CS101"]),
+            (1, "course_summary", ["CS101"]),
+            (2, "course_submission_page", ["CS101"]),
+            (2, "course_distribution", ["CS101"]),
+            (1, "distribution", []),
+            (1, "student_transcript", [0]),
+            (1, "activity", []),
+            (2, "course_item_analysis", ["CS101"]),
+            (2, "course_export", ["CS101"]),
+        ]:
+            with self.subTest(name):
+                self.assertBudget(budget, self.get(name, *args))
+
+    def test_keys(self):
+        url = reverse("keys", args=[self.user.username])
+        self.assertBudget(1, lambda keys: self.client.get(url))
+
+    def test_save_students_answers(self):
+        def post(keys):
+            self.students += 10
+            students = [
+                {"studentId": self.students + i, "studentName": "A", "answers": "ABCD"}
+                for i in range(10)
+            ]
+            return self.client.post(
+                reverse("saveStudentsAnswers"),
+                {"students": students, "course_code": "CS101"},
+                content_type="application/json",
+            )
+
+        # PostgreSQL stages the rows in a temporary table: CREATE, COPY, INSERT
+        # and DROP where SQLite runs one INSERT
+        self.assertBudget(7 if connection.vendor == "sqlite" else 10, post)
+
+    def test_edit_answer_key(self):
+        def patch(keys):
+            return self.client.patch(
+                reverse("edit"),
+                {
+                    "id": self.key.id,
+                    "answerKey": "ABCD",
+                    "courseCode": "CS101",
+                    "courseName": "Intro",
+                    "numQuestions": 4,
+                    "negativeMarking": False,
+                    "gradingScale": "STD",
+                    "totalMarks": 4,
+                    "author": self.user.username,
+                },
+                content_type="application/json",
+            )
+
+        self.assertBudget(3, patch)
+
+    def test_delete_answer_key(self):
+        def delete(keys):
+            return self.client.post(
+                reverse("delete"),
+                {"id": keys[-1].id, "author": self.user.username},
+                content_type="application/json",
+            )
+
+        self.assertBudget(6, delete)
+
+    def test_fetch_job(self):
+        job = jobs.enqueue("grade_batch", {}, total=0)
+        url = reverse("job", args=[job.id])
+        self.assertBudget(1, lambda keys: self.client.get(url))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BenchmarkCommandTests(TestCase):
+    def test_seed_grader(self):
+        call_command(
+            "seed_grader",
+            users=2,
+            courses=2,
+            students=30,
+            questions=10,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(AnswerKey.objects.count(), 4)
+        self.assertEqual(Submission.objects.count(), 120)
+        self.assertEqual(
+            CourseStats.objects.aggregate(n=Sum("submission_count"))["n"], 120
+        )
+        first = list(
+            Submission.objects.order_by("id").values_list("answers", flat=True)
+        )
+
+        call_command(
+            "seed_grader",
+            users=2,
+            courses=2,
+            students=30,
+            questions=10,
+            flush=True,
+            stdout=StringIO(),
+        )
+        again = list(
+            Submission.objects.order_by("id").values_list("answers", flat=True)
+        )
+        self.assertEqual(first, again)
+
+    def test_benchmark_covers_every_route(self):
+        output = StringIO()
+        call_command(
+            "benchmark_endpoints",
+            sizes=[5],
+            users=1,
+            courses=2,
+            questions=10,
+            repeat=1,
+            stdout=output,
+            stderr=StringIO(),
+        )
+
+        report = json.loads(output.getvalue())
+        routes = {route["route"]: route for route in report["runs"][0]["routes"]}
+        self.assertEqual(set(routes), {pattern.name for pattern in urlpatterns})
+        for name, route in routes.items():
+            self.assertLess(route["status"], 400, name)
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_benchmark_ingest(self):
+        output = StringIO()
+        call_command(
+            "benchmark_ingest",
+            rows=50,
+            questions=10,
+            repeat=1,
+            json=True,
+            stdout=output,
+        )
+
+        report = json.loads(output.getvalue())
+        methods = {r["method"]: r["rows"] for r in report["results"]}
+        self.assertEqual(methods["bulk_create"], 50)
+        self.assertEqual("copy" in methods, connection.vendor == "postgresql")
+        self.assertFalse(Submission.objects.exists())
+
+
+class MetricsTests(GraderTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_records_route_queries_and_size(self):
+        save_submissions(self.key, self.key.setting, [(1, "Ama", "ABCD")])
+        response = self.client.get(reverse("courses"), {"id": self.user.username})
+
+        text = self.scrape()
+        self.assertIn(
+            'grader_http_requests_total{route="courses",method="GET",status="200"} 1',
+            text,
+        )
+        self.assertIn(
+            'grader_http_request_sql_queries_bucket{route="courses",le="1.0"} 1', text
+        )
+        self.assertIn(
+            f'grader_http_response_size_bytes_sum{{route="courses"}} '
+            f"{len(response.content)}",
+            text,
+        )
+
+    def test_streaming_response_is_measured_when_consumed(self):
+        save_submissions(self.key, self.key.setting, [(1, "Ama", "ABCD")])
+        response = self.client.get(
+            reverse("course_export", args=["CS101"]), {"id": self.user.username}
+        )
+        self.assertNotIn('route="course_export"', self.scrape())
+
+        body = b"".join(response.streaming_content)
+        self.assertIn(
+            f'grader_http_response_size_bytes_sum{{route="course_export"}} {len(body)}',
+            self.scrape(),
+        )
+
+    def test_snapshots_from_other_processes_are_added(self):
+        other = metrics.Registry()
+        other.observe(
+            "courses", "GET", 200, {"grader_http_request_duration_seconds": 0.2}
+        )
+
+        with TemporaryDirectory() as directory:
+            with override_settings(GRADER_METRICS_DIR=directory):
+                with open(f"{directory}/metrics-1-1.json", "w") as f:
+                    json.dump(other.snapshot(), f)
+
+                self.client.get(reverse("courses"), {"id": self.user.username})
+                text = self.scrape()
+
+        self.assertIn(
+            'grader_http_requests_total{route="courses",method="GET",status="200"} 2',
+            text,
+        )
+        self.assertIn(
+            'grader_http_request_duration_seconds_bucket{route="courses",le="0.25"} 2',
+            text,
+        )
@@ -0,0 +1,98 @@
+"""
+One student's results across an author's courses.
+
+A student has at most one submission per course, found through the
+``(student_id, associated_with)`` index, so the transcript costs one indexed
+lookup per course the student sat, however many courses and submissions the
+author has. Course details come along in the same query, and grade points are
+read off each course's compiled scale (see ``grader.engine.GRADE_POINT_MAX``).
+
+A stored score counts correct questions; ``marks`` is that score in the
+course's marks, and the overall percentage weighs courses by their marks.
+"""
+
+from .engine import GRADE_POINT_MAX, get_scale
+from .models import Submission
+
+FIELDS = [
+    "student_name",
+    "score",
+    "percentage",
+    "grade",
+    "updated_at",
+    "associated_with__course_code",
+    "associated_with__course_name",
+    "associated_with__no_of_questions",
+    "associated_with__mark_per_question",
+    "associated_with__total_marks",
+    "associated_with__grading_scale",
+    "associated_with__grade_boundaries",
+]
+
+
+def transcript(author, student_id):
+    """The student's per-course results and summary, or ``None`` if none."""
+    rows = (
+        Submission.objects.filter(
+            student_id=student_id, associated_with__author__username=author
+        )
+        .order_by("associated_with__course_code")
+        .values_list(*FIELDS)
+    )
+
+    courses = []
+    name = latest = None
+    # What the percentages are out of, in marks
+    available = 0
+    for (
+        student_name,
+        score,
+        percentage,
+        grade,
+        updated_at,
+        course_code,
+        course_name,
+        no_of_questions,
+        mark_per_question,
+        total_marks,
+        grading_scale,
+        grade_boundaries,
+    ) in rows:
+        scale = get_scale(grading_scale, grade_boundaries)
+        courses.append(
+            {
+                "courseCode": course_code,
+                "courseName": course_name,
+                "score": score,
+                "numQuestions": no_of_questions,
+                "marks": score * mark_per_question,
+                "totalMarks": total_marks,
+                "percentage": percentage,
+                "grade": grade,
+                "passed": grade in scale.passing,
+                "gradePoints": scale.points.get(grade, 0.0),
+                "submittedAt": updated_at,
+            }
+        )
+        available += no_of_questions * mark_per_question
+        if student_name and (latest is None or updated_at > latest):
+            name, latest = student_name, updated_at
+
+    if not courses:
+        return None
+
+    return {
+        "studentId": student_id,
+        "studentName": name,
+        "courses": courses,
+        "summary": {
+            "courses": len(courses),
+            "passed": sum(c["passed"] for c in courses),
+            "meanPercentage": sum(c["percentage"] for c in courses) / len(courses),
+            "overallPercentage": (
+                sum(c["marks"] for c in courses) / available * 100 if available else 0.0
+            ),
+            "gpa": sum(c["gradePoints"] for c in courses) / len(courses),
+            "gpaScale": GRADE_POINT_MAX,
+        },
+    }
@@ -10,10 +10,55 @@ urlpatterns = [
         views.fetch_course_submissions,
         name="course_submissions",
     ),
+    path(
+        "course/<str:course_code>/summary",
+        views.fetch_course_summary,
+        name="course_summary",
+    ),
+    path(
+        "course/<str:course_code>/submissions",
+        views.fetch_course_submission_page,
+        name="course_submission_page",
+    ),
+    path(
+        "course/<str:course_code>/distribution",
+        views.fetch_course_distribution,
+        name="course_distribution",
+    ),
+    path(
+        "course/<str:course_code>/items",
+        views.fetch_item_analysis,
+        name="course_item_analysis",
+    ),
+    path(
+        "course/<str:course_code>/export",
+        views.export_course_results,
+        name="course_export",
+    ),
+    path(
+        "course/<str:course_code>/similarity",
+        views.start_similarity_check,
+        name="course_similarity",
+    ),
+    path("distribution", views.fetch_author_distribution, name="distribution"),
+    path("activity", views.fetch_activity, name="activity"),
+    path(
+        "student/<int:student_id>",
+        views.fetch_student_transcript,
+        name="student_transcript",
+    ),
     path("save-answers", views.save_students_answers, name="saveStudentsAnswers"),
+    path(
+        "save-answers/stream",
+        views.stream_students_answers,
+        name="streamStudentsAnswers",
+    ),
+    path("upload-sheets", views.upload_sheets, name="uploadSheets"),
     path("login", views.login_view, name="login"),
     path("register", views.register, name="register"),
     path("keys/<str:email>", views.keys, name="keys"),
     path("edit", views.edit_answer_key, name="edit"),
     path("delete", views.delete_answer_key, name="delete"),
+    path("jobs/<int:job_id>", views.fetch_job, name="job"),
+    path("cache-stats", views.fetch_cache_stats, name="cacheStats"),
 ]
@@ -1,9 +1,40 @@
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.db import IntegrityError
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from .models import AnswerKey, Setting, Submission, User
+from . import (
+    activity,
+    codec,
+    distribution,
+    export,
+    jobs,
+    metrics,
+    omr,
+    similarity,
+    transcript,
+)
+from .analysis import course_item_analysis
+from .cache import cached_response, json_response, response_cache
+from .engine import InvalidScale, get_scale
+from .ingest import (
+    ingest_stream,
+    iter_csv,
+    iter_ndjson,
+    save_submissions,
+    validate_students,
+)
+from .models import AnswerKey, Job, Setting, Submission, User
+from .pagination import InvalidPage, keyset_page
+
+INVALID_KEY = (
+    "Answer key may only contain A, B, C or D, "
+    "or bracketed sets of them such as [AC]"
+)
 
 
 # Create your views here.
@@ -21,8 +52,10 @@ def save_answer_key(request):
     mark_per_question = data["markPerQuestion"]
     negative_marking = data["negativeMarking"]
     negative_points = data["negativePoints"]
+    partial_credit = bool(data.get("partialCredit", False))
     total_marks = data["totalMarks"]
     grading_scale = data["gradingScale"]
+    custom_scale = data.get("customScale")
     author = data["author"]
 
     if any(
@@ -44,13 +77,21 @@ def save_answer_key(request):
 
         return Response({"error": "Missing required values"}, status=400)
 
+    if not codec.is_valid(answer_key):
+        return Response({"error": INVALID_KEY}, status=400)
+
+    try:
+        get_scale(grading_scale, custom_scale)
+    except InvalidScale as e:
+        return Response({"error": str(e)}, status=400)
+
     try:
         user = User.objects.get(username=author)
     except User.DoesNotExist:
         return Response({"message": "Unauthorized"}, status=401)
 
     # If answer key already exists
-    if AnswerKey.objects.filter(author=user, course_code=course_code):
+    if AnswerKey.objects.filter(author=user, course_code=course_code).exists():
         return Response(
             {"message": f"Answer key for {course_code} already exists"}, status=400
         )
@@ -61,7 +102,8 @@ def save_answer_key(request):
             course_code=course_code.upper(),
             no_of_questions=num_of_questions,
             grading_scale=grading_scale,
-            keys=answer_key,
+            grade_boundaries=custom_scale if grading_scale == "CUS" else None,
+            keys=codec.encode(answer_key),
             total_marks=total_marks,
             mark_per_question=mark_per_question,
             course_name=course_name,
@@ -69,165 +111,387 @@ def save_answer_key(request):
         a.save()
 
         # Insert settings
-        get_answer_key = AnswerKey.objects.get(author=user, course_code=course_code)  # type: ignore
-        if get_answer_key:
-            s = Setting(
-                answer_key=get_answer_key,
-                negative_marking=negative_marking,
-                points_deducted=negative_points,
-            )
-            s.save()
-
-            return Response({"message": "Saved successfully"}, status=201)
-
-
-def get_grade(score):
-    if score >= 90:
-        return "A"
-    elif score >= 80:
-        return "B"
-    elif score >= 70:
-        return "C"
-    elif score >= 60:
-        return "D"
-    elif score >= 50:
-        return "E"
+        s = Setting(
+            answer_key=a,
+            negative_marking=negative_marking,
+            points_deducted=negative_points,
+            partial_credit=partial_credit,
+        )
+        s.save()
+
+        response_cache.bump(user.username, course_code)
+        return Response({"message": "Saved successfully"}, status=201)
+
+
+def course_summary(course):
+    """Headline numbers for a course, read from its ``CourseStats`` row."""
+    stats = getattr(course, "stats", None)
+    count = stats.submission_count if stats else 0
+
+    if not count:
+        return {"count": 0, "average": 0.0, "highest": 0, "passRate": 0, "last": None}
+
+    if course.no_of_questions:
+        average = (stats.score_sum / course.no_of_questions) * 100 / count
     else:
-        return "F"
+        average = 0.0
+
+    return {
+        "count": count,
+        "average": average,
+        "highest": stats.max_score,
+        "passRate": (stats.pass_count / count) * 100,
+        "last": stats.last_activity,
+    }
+
+
+@require_GET
+@cached_response
+async def fetch_course_submissions(request, course_code):
+    author = request.GET.get("id")
+
+    try:
+        course = await AnswerKey.objects.select_related("stats").aget(
+            author__username=author, course_code=course_code.upper()
+        )
+    except AnswerKey.DoesNotExist:
+        return json_response({"error": f"Course {course_code} not found"}, status=404)
+
+    rows = await _alist(
+        Submission.objects.filter(associated_with=course).values(
+            "id",
+            "student_id",
+            "student_name",
+            "score",
+            "percentage",
+            "updated_at",
+            "grade",
+            "answers",
+        )
+    )
+
+    summary = course_summary(course)
+
+    return json_response(
+        {
+            "courseName": course.course_name,
+            "courseCode": course.course_code,
+            "totalSubmissions": summary["count"],
+            "averageScore": f"{summary['average']:.2f}",
+            "highestScore": summary["highest"],
+            "passRate": summary["passRate"],
+            "submissions": [
+                {
+                    "id": row["id"],
+                    "studentId": row["student_id"],
+                    "studentName": row["student_name"],
+                    "score": row["score"],
+                    "percentage": row["percentage"],
+                    "timeProcessed": row["updated_at"].strftime("%d/%m/%Y"),
+                    "grade": row["grade"],
+                    "answers": codec.decode_list(row["answers"]),
+                }
+                for row in rows
+            ],
+            "numOfQuestions": course.no_of_questions,
+            "correctAnswers": codec.decode_list(course.keys),
+        },
+        status=200,
+    )
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+def _get_course(author, course_code):
+    return AnswerKey.objects.select_related("stats").get(
+        author__username=author, course_code=course_code.upper()
+    )
+
+
+def _get_upload_key(course_code):
+    return AnswerKey.objects.select_related("author", "setting").get(
+        course_code=course_code
+    )
 
 
 @api_view(["GET"])
-def fetch_course_submissions(request, course_code):
-    course_code = course_code.upper()
+@cached_response
+def fetch_course_summary(request, course_code):
     author = request.query_params.get("id")
-    submissions = Submission.objects.filter(
-        associated_with__author__username=author,
-        associated_with__course_code=course_code,
+
+    try:
+        course = _get_course(author, course_code)
+    except AnswerKey.DoesNotExist:
+        return Response({"error": f"Course {course_code} not found"}, status=404)
+
+    summary = course_summary(course)
+
+    return Response(
+        {
+            "courseName": course.course_name,
+            "courseCode": course.course_code,
+            "totalSubmissions": summary["count"],
+            "averageScore": f"{summary['average']:.2f}",
+            "highestScore": summary["highest"],
+            "passRate": summary["passRate"],
+            "numOfQuestions": course.no_of_questions,
+            "correctAnswers": codec.decode_list(course.keys),
+        },
+        status=200,
     )
-    total_score = 0
 
-    scores = []
 
-    course = AnswerKey.objects.get(author__username=author, course_code=course_code)  # type: ignore
-    no_of_questions = course.no_of_questions
+@api_view(["GET"])
+@cached_response
+def fetch_course_submission_page(request, course_code):
+    params = request.query_params
+    author = params.get("id")
 
-    course_percentage_sum = 0
-    pass_count = 0
+    try:
+        course = _get_course(author, course_code)
+    except AnswerKey.DoesNotExist:
+        return Response({"error": f"Course {course_code} not found"}, status=404)
 
-    all_submissions = []
+    submissions = Submission.objects.filter(associated_with=course)
 
-    student_answers = []
-    correct_answers = []
-    for key in course.keys:
-        correct_answers.append(key)
+    # Filters
+    if params.get("grade"):
+        submissions = submissions.filter(grade__in=params["grade"].upper().split(","))
 
-    for submission in submissions:
-        j = 0
-        student_answers = []
-        while j < len(correct_answers):
-            student_answers.append(submission.answers[j])
-            j += 1
+    try:
+        if params.get("minScore"):
+            submissions = submissions.filter(score__gte=float(params["minScore"]))
+        if params.get("maxScore"):
+            submissions = submissions.filter(score__lte=float(params["maxScore"]))
+    except ValueError:
+        return Response({"error": "Score range must be numeric"}, status=400)
+
+    student = params.get("student", "").strip()
+    if student.isdigit():
+        submissions = submissions.filter(
+            Q(student_id=int(student)) | Q(student_name__icontains=student)
+        )
+    elif student:
+        submissions = submissions.filter(student_name__icontains=student)
+
+    rows = submissions.values(
+        "id",
+        "student_id",
+        "student_name",
+        "score",
+        "percentage",
+        "updated_at",
+        "grade",
+        "answers",
+    )
 
-        all_submissions.append(
-            {
-                "id": submission.id,  # type: ignore
-                "studentId": submission.student_id,
-                "studentName": submission.student_name,
-                "score": submission.score,
-                "percentage": submission.percentage,
-                "timeProcessed": submission.updated_at.strftime("%d/%m/%Y"),
-                "grade": submission.grade,
-                "answers": student_answers,
-            }
+    try:
+        page, next_cursor = keyset_page(
+            rows, params.get("sort"), params.get("cursor"), params.get("limit")
         )
-        scores.append(submission.score)
-        total_score += submission.score
+    except InvalidPage as e:
+        return Response({"error": str(e)}, status=400)
 
-        percent_score = (submission.score / no_of_questions) * 100
-        course_percentage_sum += percent_score
+    return Response(
+        {
+            "submissions": [
+                {
+                    "id": row["id"],
+                    "studentId": row["student_id"],
+                    "studentName": row["student_name"],
+                    "score": row["score"],
+                    "percentage": row["percentage"],
+                    "timeProcessed": row["updated_at"].strftime("%d/%m/%Y"),
+                    "grade": row["grade"],
+                    "answers": codec.decode_list(row["answers"]),
+                }
+                for row in page
+            ],
+            "nextCursor": next_cursor,
+        },
+        status=200,
+    )
 
-        if submission.grade in ["A", "B", "C", "D", "E"]:
-            pass_count += 1
 
-    passRate = (pass_count / len(submissions)) * 100 if len(submissions) else 0
-    course_avg = course_percentage_sum / len(submissions)
+@api_view(["GET"])
+@cached_response
+def fetch_course_distribution(request, course_code):
+    author = request.query_params.get("id")
+
+    try:
+        course = _get_course(author, course_code)
+    except AnswerKey.DoesNotExist:
+        return Response({"error": f"Course {course_code} not found"}, status=404)
+
+    submissions = Submission.objects.filter(associated_with=course)
 
     return Response(
         {
-            "courseName": course.course_name,
             "courseCode": course.course_code,
-            "totalSubmissions": len(submissions.all()),
-            "averageScore": f"{course_avg:.2f}",
-            "highestScore": max(scores),
-            "passRate": passRate,
-            "submissions": all_submissions,
-            "numOfQuestions": no_of_questions,
-            "correctAnswers": correct_answers,
+            **distribution.distribution(submissions),
         },
         status=200,
     )
 
 
 @api_view(["GET"])
-def fetch_all_submissions(request):
+@cached_response
+def fetch_author_distribution(request):
     author = request.query_params.get("id")
+    submissions = Submission.objects.filter(associated_with__author__username=author)
 
-    # Get all submissions and courses for this author
-    total_submissions = Submission.objects.filter(
-        associated_with__author__username=author
-    ).all()
+    return Response(distribution.course_distributions(submissions), status=200)
 
-    courses = AnswerKey.objects.filter(author__username=author).all()
 
-    total_percentages = 0
-    total_submissions_count = 0
-    course_list = []
+@api_view(["GET"])
+@cached_response
+def fetch_activity(request):
+    author = request.query_params.get("id")
+    period = request.query_params.get("period", "day")
+    course_code = request.query_params.get("course")
 
-    for course in courses:
-        submissions = Submission.objects.filter(associated_with_id=course.id).all()  # type: ignore
+    if period not in activity.PERIODS:
+        return Response(
+            {"error": f"period must be one of {', '.join(activity.PERIODS)}"},
+            status=400,
+        )
 
-        if not submissions:
-            continue  # Skip if no submissions
+    submissions = Submission.objects.filter(associated_with__author__username=author)
+    if course_code:
+        course_code = course_code.upper()
+        submissions = submissions.filter(associated_with__course_code=course_code)
+
+    return Response(
+        activity.activity(submissions, author, period, course_code), status=200
+    )
+
+
+@api_view(["GET"])
+@cached_response
+def fetch_student_transcript(request, student_id):
+    author = request.query_params.get("id")
+    data = transcript.transcript(author, student_id)
+
+    if data is None:
+        return Response(
+            {"error": f"No submissions for student {student_id}"}, status=404
+        )
+    return Response(data, status=200)
+
+
+@api_view(["GET"])
+def fetch_item_analysis(request, course_code):
+    author = request.query_params.get("id")
+
+    try:
+        course = _get_course(author, course_code)
+    except AnswerKey.DoesNotExist:
+        return Response({"error": f"Course {course_code} not found"}, status=404)
+
+    analysis = course_item_analysis(course)
+    options = analysis["options"]
+
+    items = [
+        {
+            "question": i + 1,
+            "correctAnswer": answer,
+            "difficulty": analysis["difficulty"][i],
+            "discrimination": analysis["discrimination"][i],
+            "pointBiserial": analysis["pointBiserial"][i],
+            "options": {choice: counts[i] for choice, counts in options.items()},
+        }
+        for i, answer in enumerate(codec.decode_list(course.keys))
+    ]
+
+    return Response(
+        {
+            "courseCode": course.course_code,
+            "totalSubmissions": analysis["totalSubmissions"],
+            "items": items,
+        },
+        status=200,
+    )
+
+
+@api_view(["GET"])
+def export_course_results(request, course_code):
+    author = request.query_params.get("id")
+    file_type = request.query_params.get("type", "csv")
+
+    try:
+        course = _get_course(author, course_code)
+    except AnswerKey.DoesNotExist:
+        return Response({"error": f"Course {course_code} not found"}, status=404)
+
+    filename = f"{course.course_code}-results.{file_type}"
 
-        last_submission = submissions.order_by("-updated_at").first()
-        last_activity = (
-            last_submission.updated_at.strftime("%d/%m/%Y")
-            if last_submission
-            else "N/A"
+    if file_type == "csv":
+        response = StreamingHttpResponse(
+            export.iter_csv(course), content_type="text/csv"
         )
+    elif file_type == "xlsx":
+        try:
+            output = export.write_xlsx(course)
+        except ImportError:
+            return Response({"error": "XLSX export requires openpyxl"}, status=400)
+
+        response = FileResponse(
+            output,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+    else:
+        return Response({"error": "type must be csv or xlsx"}, status=400)
+
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
 
-        max_score = course.no_of_questions
 
-        course_percentage_sum = 0
+@require_GET
+@cached_response
+async def fetch_all_submissions(request):
+    author = request.GET.get("id")
+
+    # One query: every course for this author joined with its stats row
+    courses = await _alist(
+        AnswerKey.objects.filter(author__username=author)
+        .select_related("stats")
+        .order_by("id")
+    )
+
+    total_percentages = 0
+    total_submissions_count = 0
+    course_list = []
 
-        for submission in submissions:
-            percent_score = (submission.score / max_score) * 100
-            course_percentage_sum += percent_score
+    for course in courses:
+        summary = course_summary(course)
 
-        course_avg = course_percentage_sum / len(submissions)
+        if not summary["count"]:
+            continue  # Skip if no submissions
 
         course_list.append(
             {
                 "id": course.id,  # type: ignore
                 "courseCode": course.course_code,
                 "courseName": course.course_name,
-                "totalSubmissions": len(submissions),
-                "lastActivity": last_activity,
-                "averageScore": f"{course_avg:.2f}",
+                "totalSubmissions": summary["count"],
+                "lastActivity": summary["last"].strftime("%d/%m/%Y"),
+                "averageScore": f"{summary['average']:.2f}",
             }
         )
 
-        total_percentages += course_percentage_sum
-        total_submissions_count += len(submissions)
+        total_percentages += summary["average"] * summary["count"]
+        total_submissions_count += summary["count"]
 
     if total_submissions_count > 0:
         overall_avg = total_percentages / total_submissions_count
     else:
         overall_avg = 0.0
 
-    return Response(
+    return json_response(
         {
-            "totalSubmissions": len(total_submissions),
+            "totalSubmissions": total_submissions_count,
             "totalCourses": len(courses),
             "overallAverage": f"{overall_avg:.2f}",
             "courseList": course_list,
@@ -244,66 +508,126 @@ def save_students_answers(request):
     if not students_data or not course_code:
         return Response({"error": "Missing cleanAnswerKey"}, status=400)
 
+    if not isinstance(students_data, list):
+        return Response({"error": "students must be a list"}, status=400)
+
     try:
-        a = AnswerKey.objects.get(course_code=course_code)
-        s = Setting.objects.get(answer_key=a)
+        a = _get_upload_key(course_code)
+        s = a.setting
     except (AnswerKey.DoesNotExist, Setting.DoesNotExist):
-        pass
+        return Response({"error": f"No answer key for {course_code}"}, status=404)
+
+    # Reject the whole batch if any row is invalid
+    rows, errors = validate_students(students_data, a)
+    if errors:
+        return Response(
+            {"error": f"{len(errors)} invalid submission(s)", "errors": errors},
+            status=400,
+        )
+
+    # Large batches are graded by a worker, and still saved all or nothing;
+    # see grader_worker
+    if len(rows) > settings.GRADER_SYNC_BATCH_LIMIT or request.query_params.get(
+        "async"
+    ):
+        job = jobs.enqueue(
+            "grade_batch", {"answer_key_id": a.id, "rows": rows}, total=len(rows)
+        )
+        return Response({"message": "Queued", "jobId": job.id}, status=202)
+
+    # Students already on record have their submission replaced
+    saved = save_submissions(a, s, rows)
+    response_cache.bump(a.author.username, a.course_code)
+
+    return Response({"message": "Saved successfully", "saved": saved}, status=201)
+
+
+@api_view(["POST"])
+def stream_students_answers(request):
+    course_code = request.query_params.get("course_code")
+    content_type = request.content_type.split(";")[0].strip()
+
+    if not course_code:
+        return Response({"error": "Missing course_code"}, status=400)
+
+    if content_type == "text/csv":
+        parse = iter_csv
+    elif content_type in ["application/x-ndjson", "application/jsonl"]:
+        parse = iter_ndjson
     else:
-        for student in students_data:
-            student_answers = student["answers"]
-            correct_answers = a.keys
-
-            j = 0
-            score = 0
-            while j < len(correct_answers):
-                # If correct
-                if student_answers[j].upper() == correct_answers[j].upper():
-                    score = score + 1
-                else:
-                    # If negative marking is True: Deduct score
-                    if s.negative_marking:
-                        if score > s.points_deducted:
-                            score = score - s.points_deducted
-                    else:
-                        pass
-
-                j = j + 1
-
-            if a.no_of_questions == 0:
-                percentage = 0
-                grade = get_grade(percentage)
-            else:
-                percentage = round((score / a.no_of_questions) * 100, 2)
-                grade = get_grade(percentage)
-
-            student_id = student["studentId"]
-            student_name = student["studentName"]
-
-            # Save to submissions
-            # todo: Check if user exists then update answer key
-            su = Submission(
-                student_id=student_id,
-                student_name=student_name,
-                associated_with=a,
-                answers=student_answers,
-                score=score,
-                percentage=percentage,
-                grade=grade,
-            )
-            su.save()
+        return Response({"error": "Expected NDJSON or CSV body"}, status=415)
 
-        return Response({"message": "Saved successfully"}, status=201)
+    if request.stream is None:
+        return Response({"error": "Empty upload"}, status=400)
 
+    try:
+        a = _get_upload_key(course_code)
+        s = a.setting
+    except (AnswerKey.DoesNotExist, Setting.DoesNotExist):
+        return Response({"error": f"No answer key for {course_code}"}, status=404)
 
-@api_view(["GET"])
-def keys(_, email):
-    user = User.objects.get(username=email)
-    keys = AnswerKey.objects.filter(author=user)
+    # Read the body line by line instead of letting DRF parse it whole
+    try:
+        progress = ingest_stream(a, s, parse(request.stream))
+    finally:
+        # Chunks committed before a failure are saved all the same
+        response_cache.bump(a.author.username, a.course_code)
+
+    if not progress["saved"]:
+        return Response({"error": "No valid submissions", **progress}, status=400)
+
+    return Response({"message": "Saved successfully", **progress}, status=201)
+
+
+@api_view(["POST"])
+def upload_sheets(request):
+    course_code = request.data.get("course_code")
+    files = request.FILES.getlist("sheets")
+
+    if not course_code or not files:
+        return Response({"error": "Missing course_code or sheets"}, status=400)
+
+    try:
+        a = _get_upload_key(course_code)
+        s = a.setting
+    except (AnswerKey.DoesNotExist, Setting.DoesNotExist):
+        return Response({"error": f"No answer key for {course_code}"}, status=404)
+
+    questions = codec.length(a.keys)
+    if questions > omr.DEFAULT_LAYOUT.max_questions:
+        return Response(
+            {
+                "error": f"Sheets hold at most {omr.DEFAULT_LAYOUT.max_questions} questions"
+            },
+            status=400,
+        )
+
+    uploads = [(f.name, f.content_type, f.read()) for f in files]
+    students, pages, errors = omr.read_uploads(uploads, questions)
+
+    rows, row_errors = validate_students(students, a)
+    # Name the sheet a rejected student was read from, not their position
+    errors += [{**pages[error.pop("row")], **error} for error in row_errors]
+    if not rows:
+        return Response({"error": "No readable sheets", "errors": errors}, status=400)
+
+    saved = save_submissions(a, s, rows)
+    response_cache.bump(a.author.username, a.course_code)
+
+    return Response(
+        {"message": "Saved successfully", "saved": saved, "errors": errors},
+        status=201,
+    )
+
+
+@require_GET
+@cached_response
+async def keys(_, email):
+    keys = AnswerKey.objects.filter(author__username=email).select_related("setting")
 
     answer_keys = []
-    for key in keys:
-        s = Setting.objects.filter(answer_key=key).last()
+    async for key in keys:
+        s = key.setting
 
         answer_keys.append(
             {
@@ -312,15 +636,17 @@ def keys(_, email):
                 "numQuestions": key.no_of_questions,
                 "courseName": key.course_name,
                 "gradingScale": key.grading_scale,
-                "answerKey": key.keys,
+                "customScale": key.grade_boundaries,
+                "answerKey": codec.decode(key.keys),
                 "dateAdded": key.created_at,
                 "updatedAt": key.updated_at,
                 "negativeMarking": s.negative_marking,  # type: ignore
+                "partialCredit": s.partial_credit,  # type: ignore
                 "totalMarks": key.total_marks,
                 "markPerQuestion": key.mark_per_question,
             }
         )
-    return Response(answer_keys, status=200)
+    return json_response(answer_keys, status=200)
 
 
 @api_view(["PATCH"])
@@ -337,6 +663,7 @@ def edit_answer_key(request):
     num_of_questions = data["numQuestions"]
     negative_marking = data["negativeMarking"]
     grading_scale = data["gradingScale"]
+    custom_scale = data.get("customScale")
     total_marks = data["totalMarks"]
     author = data["author"]
 
@@ -356,27 +683,48 @@ def edit_answer_key(request):
 
         return Response({"error": "Missing required values"}, status=400)
 
+    if not codec.is_valid(answer_key):
+        return Response({"error": INVALID_KEY}, status=400)
+
     try:
-        author_obj = User.objects.get(username=author)
-    except User.DoesNotExist:
+        scale = get_scale(grading_scale, custom_scale)
+    except InvalidScale as e:
+        return Response({"error": str(e)}, status=400)
+
+    a = AnswerKey.objects.filter(id=id, author__username=author)
+    existing = list(a)
+    if not existing:
         return Response({"message": "Unauthorized request"}, status=400)
-    else:
-        a = AnswerKey.objects.filter(id=id, author=author_obj)
 
-        # Update answer key
-        a.update(
-            course_code=course_code,
-            course_name=course_name,
-            no_of_questions=num_of_questions,
-            keys=answer_key,
-            total_marks=total_marks,
-        )
+    # Update answer key
+    a.update(
+        course_code=course_code,
+        course_name=course_name,
+        no_of_questions=num_of_questions,
+        grading_scale=grading_scale,
+        grade_boundaries=custom_scale if grading_scale == "CUS" else None,
+        keys=codec.encode(answer_key),
+        total_marks=total_marks,
+    )
+
+    # Update setting for answer key
+    changes = {"negative_marking": negative_marking}
+    if "partialCredit" in data:
+        changes["partial_credit"] = bool(data["partialCredit"])
+    Setting.objects.filter(answer_key__in=existing).update(**changes)
 
-        # Update setting for answer key
-        s = Setting.objects.filter(answer_key=a.last())
-        s.update(negative_marking=negative_marking)
+    for key in existing:
+        # Compiled scales are cached, so an unchanged scale is the same object
+        if key.scale is not scale:
+            # Stored grades follow the new scale
+            key.grading_scale = grading_scale
+            key.grade_boundaries = custom_scale if grading_scale == "CUS" else None
+            Submission.objects.regrade(key)
 
-        return Response({"message": "Answer Key Updated"}, status=200)
+    response_cache.bump(author, course_code, *[key.course_code for key in existing])
+    activity.forget(author)
+
+    return Response({"message": "Answer Key Updated"}, status=200)
 
 
 @api_view(["POST"])
@@ -388,15 +736,82 @@ def delete_answer_key(request):
     if author is None:
         return Response({"error": "Unauthorized Access"}, status=401)
 
-    try:
-        author_obj = User.objects.get(username=author)
-    except User.DoesNotExist:
+    a = AnswerKey.objects.filter(id=id, author__username=author)
+    course_codes = list(a.values_list("course_code", flat=True))
+    if not course_codes:
         return Response({"message": "Unauthorized request"}, status=400)
-    else:
-        a = AnswerKey.objects.filter(id=id, author=author_obj)
-        a.delete()
 
-        return Response({"message": "Answer Key Deleted"}, status=200)
+    a.delete()
+    response_cache.bump(author, *course_codes)
+    activity.forget(author)
+
+    return Response({"message": "Answer Key Deleted"}, status=200)
+
+
+@api_view(["POST"])
+def start_similarity_check(request, course_code):
+    author = request.query_params.get("id")
+
+    try:
+        course = _get_course(author, course_code)
+    except AnswerKey.DoesNotExist:
+        return Response({"error": f"Course {course_code} not found"}, status=404)
+
+    try:
+        top = int(request.data.get("top", similarity.TOP_PAIRS))
+        min_shared = int(request.data.get("minShared", similarity.MIN_SHARED))
+    except (TypeError, ValueError):
+        return Response({"error": "top and minShared must be integers"}, status=400)
+    if not 0 < top <= similarity.MAX_PAIRS or min_shared < 1:
+        return Response(
+            {
+                "error": f"top must be 1-{similarity.MAX_PAIRS} "
+                "and minShared at least 1"
+            },
+            status=400,
+        )
+
+    # Comparing every pair of students takes a while; see grader_worker
+    job = jobs.enqueue(
+        "similarity",
+        {"answer_key_id": course.id, "top": top, "minShared": min_shared},
+    )
+    return Response({"message": "Queued", "jobId": job.id}, status=202)
+
+
+@api_view(["GET"])
+def fetch_job(_, job_id):
+    try:
+        job = Job.objects.get(id=job_id)
+    except Job.DoesNotExist:
+        return Response({"error": "Job not found"}, status=404)
+
+    return Response(
+        {
+            "id": job.id,  # type: ignore
+            "kind": job.kind,
+            "state": job.state,
+            "progress": job.progress,
+            "total": job.total,
+            "result": job.result,
+            "error": job.error.strip().splitlines()[-1] if job.error else None,
+            "createdAt": job.created_at,
+            "startedAt": job.started_at,
+            "finishedAt": job.finished_at,
+        },
+        status=200,
+    )
+
+
+@api_view(["GET"])
+def fetch_cache_stats(_):
+    return Response(response_cache.stats(), status=200)
+
+
+def fetch_metrics(_):
+    return HttpResponse(
+        metrics.collect(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 @api_view(["POST"])
@@ -10,9 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -54,6 +56,7 @@ CORS_ALLOW_CREDENTIALS = True
 
 
 MIDDLEWARE = [
+    "grader.metrics.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -87,12 +90,108 @@ WSGI_APPLICATION = "server.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# DATABASE_ENGINE picks the backend: "sqlite" (the default, a file next to
+# manage.py) or "postgres". PostgreSQL needs psycopg 3 with its pool extra
+# (see requirements.txt); run the test suite against it with
+#   DATABASE_ENGINE=postgres python manage.py test grader
+# which creates and drops a "test_<DATABASE_NAME>" database.
+DATABASE_ENGINE = config("DATABASE_ENGINE", default="sqlite")
+# SQLite tuned for concurrent uploads: every new connection switches to WAL
+# (readers no longer block the writer), relaxes fsyncs to WAL checkpoints,
+# maps and caches more of the file and waits for a busy lock instead of
+# failing; transactions take the write lock up front so two of them never
+# deadlock upgrading from a read
+SQLITE_PRODUCTION = config("SQLITE_PRODUCTION", default=False, cast=bool)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": config("SQLITE_MMAP_SIZE", default=256 * 2**20, cast=int),
+    # Negative sizes are in KiB
+    "cache_size": -config("SQLITE_CACHE_SIZE_KB", default=64 * 2**10, cast=int),
+    "busy_timeout": config("SQLITE_BUSY_TIMEOUT_MS", default=10_000, cast=int),
+}
+
+if DATABASE_ENGINE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        }
+    }
+    if SQLITE_PRODUCTION:
+        DATABASES["default"]["OPTIONS"] = {
+            "init_command": ";".join(
+                f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            "transaction_mode": "IMMEDIATE",
+        }
+elif DATABASE_ENGINE == "postgres":
+    # Connections per process; with DATABASE_POOL_SIZE=0 each thread keeps one
+    # persistent connection instead of borrowing from a pool
+    DATABASE_POOL_SIZE = config("DATABASE_POOL_SIZE", default=10, cast=int)
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": config("DATABASE_NAME", default="grader"),
+            "USER": config("DATABASE_USER", default="grader"),
+            "PASSWORD": config("DATABASE_PASSWORD", default=""),
+            "HOST": config("DATABASE_HOST", default="localhost"),
+            "PORT": config("DATABASE_PORT", default=5432, cast=int),
+            "CONN_MAX_AGE": 0 if DATABASE_POOL_SIZE else 60,
+            "CONN_HEALTH_CHECKS": not DATABASE_POOL_SIZE,
+            "OPTIONS": {
+                "pool": (
+                    {
+                        "min_size": config(
+                            "DATABASE_POOL_MIN_SIZE", default=2, cast=int
+                        ),
+                        "max_size": DATABASE_POOL_SIZE,
+                        # Seconds a request waits for a free connection
+                        "timeout": config(
+                            "DATABASE_POOL_TIMEOUT", default=10.0, cast=float
+                        ),
+                    }
+                    if DATABASE_POOL_SIZE
+                    else False
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(
+        f"DATABASE_ENGINE must be 'sqlite' or 'postgres', not {DATABASE_ENGINE!r}"
+    )
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# The read cache's versions (grader.cache) and the activity history live in
+# Django's cache, and a write by one process, a web worker or grader_worker,
+# has to invalidate them for all of them, so the cache must be shared between
+# processes. The default keeps it in files under CACHE_LOCATION, which serves
+# every process on one host; to span hosts point CACHE_BACKEND at Redis or
+# Memcached with CACHE_LOCATION as its URL.
+FILE_CACHE = "django.core.cache.backends.filebased.FileBasedCache"
+PROCESS_LOCAL_CACHES = [
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+]
+CACHE_BACKEND = config("CACHE_BACKEND", default=FILE_CACHE)
+if CACHE_BACKEND in PROCESS_LOCAL_CACHES:
+    raise ImproperlyConfigured(
+        f"CACHE_BACKEND must be shared between processes, not {CACHE_BACKEND!r}"
+    )
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": config("CACHE_LOCATION", default=str(BASE_DIR / ".cache")),
     }
 }
+if CACHE_BACKEND == FILE_CACHE:
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": config("CACHE_MAX_ENTRIES", default=10_000, cast=int)
+    }
 
 
 # Password validation
@@ -135,3 +234,38 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Grader
+# Maximum number of responses kept by the in-process read cache
+GRADER_RESPONSE_CACHE_SIZE = config("GRADER_RESPONSE_CACHE_SIZE", default=512, cast=int)
+# Processes used to read uploaded bubble sheets
+GRADER_OMR_WORKERS = config("GRADER_OMR_WORKERS", default=os.cpu_count() or 1, cast=int)
+# Uploads with more rows than this are graded by a background job
+GRADER_SYNC_BATCH_LIMIT = config("GRADER_SYNC_BATCH_LIMIT", default=1000, cast=int)
+# Jobs each grader_worker process runs at once
+GRADER_WORKER_CONCURRENCY = config("GRADER_WORKER_CONCURRENCY", default=2, cast=int)
+# Seconds a running job may go without a heartbeat before another worker
+# reclaims it, and how many times a job is started before it is failed
+GRADER_JOB_LEASE = config("GRADER_JOB_LEASE", default=300.0, cast=float)
+GRADER_JOB_MAX_ATTEMPTS = config("GRADER_JOB_MAX_ATTEMPTS", default=3, cast=int)
+# Commit concurrent uploads in this process through one writer, merging the
+# batches waiting at the time into one transaction of up to ..._MAX_ROWS rows
+GRADER_WRITE_QUEUE = config(
+    "GRADER_WRITE_QUEUE",
+    default=DATABASE_ENGINE == "sqlite" and SQLITE_PRODUCTION,
+    cast=bool,
+)
+GRADER_WRITE_QUEUE_MAX_ROWS = config(
+    "GRADER_WRITE_QUEUE_MAX_ROWS", default=10_000, cast=int
+)
+# Working memory of one answer-similarity job, beyond the course's answers
+GRADER_SIMILARITY_MEMORY_MB = config(
+    "GRADER_SIMILARITY_MEMORY_MB", default=64, cast=int
+)
+# Directory shared by worker processes for /metrics; unset for one process
+GRADER_METRICS_DIR = config("GRADER_METRICS_DIR", default="")
+# Seconds between a process's metrics snapshots in GRADER_METRICS_DIR
+GRADER_METRICS_FLUSH_INTERVAL = config(
+    "GRADER_METRICS_FLUSH_INTERVAL", default=5.0, cast=float
+)
@@ -18,7 +18,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from grader.views import fetch_metrics
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/user/", include("grader.urls")),
+    path("metrics", fetch_metrics, name="metrics"),
 ]